@@ -1,26 +1,72 @@
+import copy
 import datetime
-import math
+import json
+import os
+import threading
 import time
-from typing import Optional, Dict, List, Union
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from contextlib import contextmanager
+from operator import itemgetter
+from pathlib import Path
+from typing import Optional, Dict, List, Union, Callable, Iterator, Tuple, Any, Set
 
-import dateparser
+import requests
 from binance.client import Client
 from binance.exceptions import BinanceAPIException
+from requests.adapters import HTTPAdapter
 from tqdm import tqdm
+from urllib3.util.retry import Retry
 
-from BinanceWatch.storage import tables
 from BinanceWatch.utils.LoggerGenerator import LoggerGenerator
+from BinanceWatch.utils.RateLimiter import RateLimiter
+from BinanceWatch.utils.paths import get_data_path
 from BinanceWatch.utils.time_utils import datetime_to_millistamp
 from BinanceWatch.storage.BinanceDataBase import BinanceDataBase
 
+try:
+    import orjson
+except ImportError:  # optional faster json decoder, requests decodes the responses otherwise
+    orjson = None
+
 
 class BinanceManager:
     """
     This class is in charge of filling the database by calling the binance API
     """
     API_MAX_RETRY = 3
-
-    def __init__(self, api_key: str, api_secret: str, account_name: str = 'default'):
+    HTTP_MAX_RETRY = 3
+    HTTP_TIMEOUT = 30  # seconds, a dropped keep-alive connection would otherwise block a worker forever
+    MARGIN_PAIRS_CACHE_TTL = 3600  # seconds
+    UNUSED_ISOLATED_SYMBOL_TTL = 30 * 24 * 3600  # seconds
+    EXCHANGE_INFO_CACHE_TTL = 3600  # seconds
+    API_WEIGHT_PER_MINUTE = 1200
+    # request weights of the heavy client methods, the other methods weigh 1
+    API_METHOD_WEIGHTS = {'get_my_trades': 10, 'get_exchange_info': 10, 'get_account': 10}
+    # methods of binance.Client that _call_binance_client is allowed to call
+    CLIENT_METHODS = ('_request_margin_api', 'get_account', 'get_deposit_history', 'get_dust_log', 'get_exchange_info',
+                      'get_lending_interest_history', 'get_lending_purchase_history', 'get_lending_redemption_history',
+                      'get_margin_loan_details', 'get_margin_repay_details', 'get_margin_trades', 'get_my_trades',
+                      'get_withdraw_history', 'query_universal_transfer_history')
+    PAGE_SIZE = 100  # maximum number of rows per page accepted by the endpoints paginated with 'current'
+    COMMIT_ROWS_INTERVAL = 5000  # trades inserted between two intermediate commits of a long trades update
+    LENDING_TYPES = ('DAILY', 'ACTIVITY', 'CUSTOMIZED_FIXED')
+    UNIVERSAL_TRANSFER_TYPES = ('MAIN_C2C', 'MAIN_UMFUTURE', 'MAIN_CMFUTURE', 'MAIN_MARGIN', 'MAIN_MINING', 'C2C_MAIN',
+                                'C2C_UMFUTURE', 'C2C_MINING', 'C2C_MARGIN', 'UMFUTURE_MAIN', 'UMFUTURE_C2C',
+                                'UMFUTURE_MARGIN', 'CMFUTURE_MAIN', 'CMFUTURE_MARGIN', 'MARGIN_MAIN', 'MARGIN_UMFUTURE',
+                                'MARGIN_CMFUTURE', 'MARGIN_MINING', 'MARGIN_C2C', 'MINING_MAIN', 'MINING_UMFUTURE',
+                                'MINING_C2C', 'MINING_MARGIN')
+    # transfer types involving each account, to filter the universal transfers without scanning all the types
+    _TRANSFER_TYPES_BY_FILTER: Dict[str, List[str]] = {}
+    for _transfer_type in UNIVERSAL_TRANSFER_TYPES:
+        for _account in _transfer_type.split('_'):
+            _TRANSFER_TYPES_BY_FILTER.setdefault(_account, []).append(_transfer_type)
+    del _transfer_type, _account
+    _ISOLATED_TRANSFER_TYPES = {('SPOT', 'ISOLATED_MARGIN'): 'IN', ('ISOLATED_MARGIN', 'SPOT'): 'OUT'}
+    _THREE_MONTHS_MS = 1000 * 3600 * 24 * 30 * 3  # age of the margin records archived by Binance
+    _TRADE_FIELDS = itemgetter('id', 'time', 'qty', 'price', 'commission', 'commissionAsset', 'isBuyer')
+
+    def __init__(self, api_key: str, api_secret: str, account_name: str = 'default', synchronous: str = 'NORMAL',
+                 max_workers: int = 8, min_sync_interval: float = 0):
         """
         Initialise the binance manager.
 
@@ -31,24 +77,51 @@ class BinanceManager:
         :param account_name: if you have several accounts to monitor, you need to give them different names or the
             database will collide
         :type account_name: str
+        :param synchronous: sqlite synchronous mode of the database, 'OFF' speeds up large first updates at the
+            cost of durability on a power failure, see BinanceDataBase
+        :type synchronous: str
+        :param max_workers: number of threads used to fetch the API concurrently when updating many assets or symbols
+        :type max_workers: int
+        :param min_sync_interval: minimum number of seconds between two updates of the same data: the spot deposits,
+            withdraws and dividends, the spot trades of a symbol and the margin loans and repays of an asset are not
+            fetched again if they were updated more recently. 0 (default) always fetches them.
+        :type min_sync_interval: float
         """
+        if max_workers < 1:
+            raise ValueError(f"max_workers should be at least 1 but {max_workers} was received")
         self.account_name = account_name
-        self.db = BinanceDataBase(name=f"{self.account_name}_db")
-        self.client = Client(api_key=api_key, api_secret=api_secret)
+        self.max_workers = max_workers
+        self.min_sync_interval = min_sync_interval
+        self.db = BinanceDataBase(name=f"{self.account_name}_db", synchronous=synchronous)
+        self.client = Client(api_key=api_key, api_secret=api_secret,
+                             requests_params={'timeout': BinanceManager.HTTP_TIMEOUT})
+        self._mount_http_adapter()
+        if orjson is not None:
+            self.client.session.hooks['response'].append(self._orjson_response_hook)
+        # functions of the client class, resolved once: each thread calls them on its own copy of the client
+        self._client_methods = {name: getattr(type(self.client), name) for name in BinanceManager.CLIENT_METHODS
+                                if hasattr(type(self.client), name)}
+        self._thread_data = threading.local()
+        self._thread_data.client = self.client
+        self._cross_margin_pairs_cache = None
+        self._isolated_margin_pairs_cache = None
+        self._spot_symbols_cache = None
+        self.rate_limiter = RateLimiter(capacity=BinanceManager.API_WEIGHT_PER_MINUTE, period=60)
         self.logger = LoggerGenerator.get_logger(f"BinanceManager_{self.account_name}")
 
     def update_spot(self):
         """
-        call all update methods related to the spot account
+        call all update methods related to the spot account. The trades are updated last, so that the assets of the
+        other updates are known when the traded symbols are selected.
 
         :return: None
         :rtype: None
         """
-        self.update_all_spot_trades()
         self.update_spot_deposits()
         self.update_spot_withdraws()
         self.update_spot_dusts()
         self.update_spot_dividends()
+        self.update_all_spot_trades()
         self.update_universal_transfers(transfer_filter='MAIN')
 
     def update_cross_margin(self):
@@ -71,23 +144,16 @@ class BinanceManager:
         :return: None
         :rtype: None
         """
-        self.update_isolated_margin_transfers()  # fetch transfers across all isolated symbols
+        with self._progress_bar(0) as pbar:  # a single progress bar for all the isolated updates
+            self.update_isolated_margin_transfers(pbar=pbar)  # fetch transfers across all isolated symbols
 
-        # we will now update only the isolated symbols that have been funded
-        transfers = self.db.get_isolated_transfers()
-        symbols_info = []
-        for _, _, _, symbol, token, _ in transfers:
-            if symbol.startswith(token):
-                asset, ref_asset = token, symbol[len(token):]
-            else:
-                asset, ref_asset = symbol[:-len(token)], token
-            symbols_info.append({'asset': asset, 'ref_asset': ref_asset, 'symbol': symbol})
-
-        self.update_isolated_margin_trades(symbols_info)
-        self.update_isolated_margin_loans(symbols_info)
-        self.update_isolated_margin_interests(symbols_info)
-        self.update_isolated_margin_repays(symbols_info)
+            # we will now update only the isolated symbols that have been funded
+            symbols_info = self._get_funded_isolated_symbols_info()
 
+            self.update_isolated_margin_trades(symbols_info, pbar=pbar)
+            self.update_isolated_margin_loans(symbols_info, pbar=pbar)
+            self.update_isolated_margin_interests(symbols_info, pbar=pbar)
+            self.update_isolated_margin_repays(symbols_info, pbar=pbar)
 
     def update_lending(self):
         """
@@ -155,9 +221,153 @@ class BinanceManager:
             client_params['path'] = 'margin/allPairs'
         return self._call_binance_client('_request_margin_api', client_params)
 
+    def get_cross_margin_pairs(self, refresh: bool = False) -> Tuple[List[Dict], Set[str]]:
+        """
+        Return the cross margin symbols info and the set of the assets they trade. The API response is kept on the
+        manager and in the data folder for MARGIN_PAIRS_CACHE_TTL seconds, so that the cross margin updates, and the
+        other accounts, share a single call.
+
+        :param refresh: if True, ignore the cached value and call the API again
+        :type refresh: bool
+        :return: symbols info as returned by get_margin_symbol_info and the set of their base and quote assets
+        :rtype: Tuple[List[Dict], Set[str]]
+        """
+        cache = self._cross_margin_pairs_cache
+        if refresh or cache is None or time.time() - cache[0] > BinanceManager.MARGIN_PAIRS_CACHE_TTL:
+            save_time, symbols_info = self._load_margin_pairs(isolated=False, refresh=refresh)
+            assets = {symbol_info['base'] for symbol_info in symbols_info}
+            assets |= {symbol_info['quote'] for symbol_info in symbols_info}
+            cache = (save_time, symbols_info, assets)
+            self._cross_margin_pairs_cache = cache
+        return cache[1], cache[2]
+
+    def get_isolated_margin_pairs(self, refresh: bool = False) -> List[Dict]:
+        """
+        Return the isolated margin symbols info. The API response is kept on the manager and in the data folder for
+        MARGIN_PAIRS_CACHE_TTL seconds, so that the isolated margin updates, and the other accounts, share a single
+        signed call.
+
+        :param refresh: if True, ignore the cached value and call the API again
+        :type refresh: bool
+        :return: symbols info as returned by get_margin_symbol_info
+        :rtype: List[Dict]
+        """
+        cache = self._isolated_margin_pairs_cache
+        if refresh or cache is None or time.time() - cache[0] > BinanceManager.MARGIN_PAIRS_CACHE_TTL:
+            cache = self._load_margin_pairs(isolated=True, refresh=refresh)
+            self._isolated_margin_pairs_cache = cache
+        return cache[1]
+
+    def _load_margin_pairs(self, isolated: bool, refresh: bool = False) -> Tuple[float, List[Dict]]:
+        """
+        Return the margin symbols info saved in the data folder if they are less than MARGIN_PAIRS_CACHE_TTL seconds
+        old, otherwise fetch them from the API and save them. The list of the margin pairs is the same for all the
+        accounts, so the file is shared by them.
+
+        :param isolated: If isolated data are to be returned, otherwise it will be cross margin data
+        :type isolated: bool
+        :param refresh: if True, ignore the saved value and call the API again
+        :type refresh: bool
+        :return: the time of the API call and the symbols info as returned by get_margin_symbol_info
+        :rtype: Tuple[float, List[Dict]]
+        """
+        cache_path = get_data_path() / f"margin_pairs_{'isolated' if isolated else 'cross'}.json"
+        cache = None if refresh else self._load_json_cache(cache_path, BinanceManager.MARGIN_PAIRS_CACHE_TTL)
+        if cache is None:
+            symbols_info = self.get_margin_symbol_info(isolated=isolated)
+            self._save_json_cache(cache_path, symbols_info)
+            cache = (time.time(), symbols_info)
+        return cache
+
+    def get_spot_symbols_info(self, refresh: bool = False) -> List[Dict]:
+        """
+        Return the spot symbols info of the exchange. The response of get_exchange_info is large and rarely changes,
+        so its symbols are saved in the data folder, shared by all the accounts, and are kept on the manager. Both
+        copies are used for EXCHANGE_INFO_CACHE_TTL seconds.
+
+        sources:
+        https://python-binance.readthedocs.io/en/latest/binance.html#binance.client.Client.get_exchange_info
+        https://binance-docs.github.io/apidocs/spot/en/#exchange-information
+
+        :param refresh: if True, ignore the cached values and call the API again
+        :type refresh: bool
+        :return: symbols info as returned by the API
+        :rtype: List[Dict]
+        """
+        cache = self._spot_symbols_cache
+        if refresh or cache is None or time.time() - cache[0] > BinanceManager.EXCHANGE_INFO_CACHE_TTL:
+            cache_path = get_data_path() / "exchange_info_symbols.json"
+            cache = None if refresh else self._load_json_cache(cache_path, BinanceManager.EXCHANGE_INFO_CACHE_TTL)
+            if cache is None:
+                symbols_info = self._call_binance_client('get_exchange_info')['symbols']
+                self._save_json_cache(cache_path, symbols_info)
+                cache = (time.time(), symbols_info)
+            self._spot_symbols_cache = cache
+        return cache[1]
+
+    def get_spot_assets(self) -> Set[str]:
+        """
+        Return the assets the account holds on its spot wallet or that appear in its spot history in the database
+
+        sources:
+        https://python-binance.readthedocs.io/en/latest/binance.html#binance.client.Client.get_account
+        https://binance-docs.github.io/apidocs/spot/en/#account-information-user_data
+
+        :return: names of the assets
+        :rtype: Set[str]
+        """
+        balances = self._call_binance_client('get_account')['balances']
+        assets = {balance['asset'] for balance in balances if float(balance['free']) + float(balance['locked']) > 0}
+        return assets | self.db.get_spot_assets()
+
+    def _load_json_cache(self, cache_path: Path, max_age: float) -> Optional[Tuple[float, Any]]:
+        """
+        Load a value saved by _save_json_cache if it was saved less than max_age seconds ago
+
+        :param cache_path: path of the cache file
+        :type cache_path: Path
+        :param max_age: maximum age of the file in seconds
+        :type max_age: float
+        :return: the time of the save and the value, None if the file is missing, outdated or unreadable
+        :rtype: Optional[Tuple[float, Any]]
+        """
+        try:
+            save_time = cache_path.stat().st_mtime
+            if time.time() - save_time > max_age:
+                return None
+            if orjson is not None:
+                return save_time, orjson.loads(cache_path.read_bytes())
+            with open(cache_path, 'r') as file:
+                return save_time, json.load(file)
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError) as err:
+            self.logger.warning(f"could not read the cache file {cache_path}: {err}")
+            return None
+
+    def _save_json_cache(self, cache_path: Path, value: Any):
+        """
+        Save a json value in a cache file. The file is written aside then moved, so that other processes never read a
+        partially written file.
+
+        :param cache_path: path of the cache file
+        :type cache_path: Path
+        :param value: value to save
+        :type value: Any
+        :return: None
+        :rtype: None
+        """
+        tmp_path = cache_path.with_name(f"{cache_path.name}.{os.getpid()}.tmp")
+        try:
+            with open(tmp_path, 'w') as file:
+                json.dump(value, file)
+            os.replace(tmp_path, cache_path)
+        except OSError as err:
+            self.logger.warning(f"could not write the cache file {cache_path}: {err}")
+
     def update_universal_transfers(self, transfer_filter: Optional[str] = None):
         """
-        update the universal transfers database.
+        update the universal transfers database. The transfer types are fetched concurrently.
 
         sources:
         https://python-binance.readthedocs.io/en/latest/binance.html#binance.client.Client.query_universal_transfer_history
@@ -168,77 +378,70 @@ class BinanceManager:
         :return: None
         :rtype: None
         """
-        all_types = ['MAIN_C2C', 'MAIN_UMFUTURE', 'MAIN_CMFUTURE', 'MAIN_MARGIN', 'MAIN_MINING', 'C2C_MAIN',
-                     'C2C_UMFUTURE', 'C2C_MINING', 'C2C_MARGIN', 'UMFUTURE_MAIN', 'UMFUTURE_C2C',
-                     'UMFUTURE_MARGIN', 'CMFUTURE_MAIN', 'CMFUTURE_MARGIN', 'MARGIN_MAIN', 'MARGIN_UMFUTURE',
-                     'MARGIN_CMFUTURE', 'MARGIN_MINING', 'MARGIN_C2C', 'MINING_MAIN', 'MINING_UMFUTURE',
-                     'MINING_C2C', 'MINING_MARGIN']
-        if transfer_filter is not None:
-            transfers_types = list(filter(lambda x: transfer_filter in x, all_types))
+        if transfer_filter is None:
+            transfers_types = BinanceManager.UNIVERSAL_TRANSFER_TYPES
+        elif transfer_filter in BinanceManager._TRANSFER_TYPES_BY_FILTER:
+            transfers_types = BinanceManager._TRANSFER_TYPES_BY_FILTER[transfer_filter]
         else:
-            transfers_types = all_types
-        pbar = tqdm(total=len(transfers_types))
-        for transfer_type in transfers_types:
-            pbar.set_description(f"fetching transfer type {transfer_type}")
-            latest_time = self.db.get_last_universal_transfer_time(transfer_type=transfer_type) + 1
-            current = 1
-            while True:
-                client_params = {
-                    'type': transfer_type,
-                    'startTime': latest_time,
-                    'current': current,
-                    'size': 100
-                }
-                universal_transfers = self._call_binance_client('query_universal_transfer_history', client_params)
-
-                try:
-                    universal_transfers = universal_transfers['rows']
-                except KeyError:
-                    break
-                for transfer in universal_transfers:
-                    self.db.add_universal_transfer(transfer_id=transfer['tranId'],
-                                                   transfer_type=transfer['type'],
-                                                   transfer_time=transfer['timestamp'],
-                                                   asset=transfer['asset'],
-                                                   amount=float(transfer['amount'])
-                                                   )
-
-                if len(universal_transfers):
-                    current += 1  # next page
-                    self.db.commit()
-                else:
-                    break
-            pbar.update()
-        pbar.close()
+            transfers_types = [t for t in BinanceManager.UNIVERSAL_TRANSFER_TYPES if transfer_filter in t]
+        fetch_params = [{'transfer_type': transfer_type,
+                         'latest_time': self.db.get_last_universal_transfer_time(transfer_type=transfer_type)}
+                        for transfer_type in transfers_types]
+
+        with self._progress_bar(len(transfers_types)) as pbar, self.db.transaction():
+            for params, universal_transfers in self._fetch_concurrently(self._fetch_universal_transfers, fetch_params):
+                pbar.set_description(f"fetched transfer type {params['transfer_type']}", refresh=False)
+                rows = [(transfer['tranId'], transfer['type'], transfer['timestamp'], transfer['asset'],
+                         float(transfer['amount'])) for transfer in universal_transfers]
+                self.db.add_universal_transfers(rows, auto_commit=False)
+                pbar.update()
+
+    def _fetch_universal_transfers(self, transfer_type: str, latest_time: int) -> List[Dict]:
+        """
+        fetch from the API the universal transfers of a type made after a given time. This method does not use the
+        database, so it can be called from several threads at once.
+
+        :param transfer_type: type of the transfers (ex: 'MAIN_MARGIN')
+        :type transfer_type: str
+        :param latest_time: millistamp of the latest transfer of this type already saved
+        :type latest_time: int
+        :return: transfers as returned by the API
+        :rtype: List[Dict]
+        """
+        client_params = {
+            'type': transfer_type,
+            'startTime': latest_time + 1,
+            'size': BinanceManager.PAGE_SIZE
+        }
+        return list(self._paginate('query_universal_transfer_history', client_params))
 
-    def update_isolated_margin_transfers(self, symbols_info: Optional[List[Dict]] = None):
+    def update_isolated_margin_transfers(self, symbols_info: Optional[List[Dict]] = None,
+                                         pbar: Optional[tqdm] = None):
         """
-        Update the transfers to and from isolated symbols
+        Update the transfers to and from isolated symbols. The symbols are fetched concurrently.
 
         :param symbols_info: details on the symbols to fetch repays on. Each dictionary needs the fields 'asset' and
             'ref_asset'. If not provided, will update all isolated symbols.
         :type symbols_info: Optional[List[Dict]]
+        :param pbar: progress bar shared with other updates, a new one is displayed if not provided
+        :type pbar: Optional[tqdm]
         :return: None
         :rtype: None
         """
-        asset_key = 'asset'
-        ref_asset_key = 'ref_asset'
-        if symbols_info is None:
-            symbols_info = self.get_margin_symbol_info(isolated=True)
-            asset_key = 'base'
-            ref_asset_key = 'quote'
-
-        pbar = tqdm(total=len(symbols_info))
-        for symbol_info in symbols_info:
-            asset = symbol_info[asset_key]
-            ref_asset = symbol_info[ref_asset_key]
-            symbol = symbol_info.get('symbol', f"{asset}{ref_asset}")
-
-            pbar.set_description(f"fetching isolated margin transfers for {symbol}")
-            self.update_isolated_symbol_transfers(isolated_symbol=symbol)
-            pbar.update()
-
-        pbar.close()
+        if symbols_info is None:  # a transfer is what funds a symbol, so every isolated symbol is checked here
+            symbols = [symbol_info['symbol'] for symbol_info in self.get_isolated_margin_pairs()]
+        else:
+            symbols = [symbol for symbol, _, _ in self._get_isolated_symbols(symbols_info)]
+        fetch_params = [{'isolated_symbol': symbol,
+                         'latest_time': self.db.get_last_isolated_transfer_time(isolated_symbol=symbol)}
+                        for symbol in symbols]
+
+        with self._progress_bar(len(symbols), pbar) as pbar, self.db.transaction():
+            for params, transfers in self._fetch_concurrently(self._fetch_isolated_symbol_transfers, fetch_params):
+                pbar.set_description(f"fetched isolated margin transfers for {params['isolated_symbol']}",
+                                     refresh=False)
+                self._save_isolated_transfers(transfers, isolated_symbol=params['isolated_symbol'])
+                pbar.update()
 
     def update_isolated_symbol_transfers(self, isolated_symbol: str):
         """
@@ -253,75 +456,85 @@ class BinanceManager:
         :rtype:
         """
         latest_time = self.db.get_last_isolated_transfer_time(isolated_symbol=isolated_symbol)
-        current = 1
+        transfers = self._fetch_isolated_symbol_transfers(isolated_symbol=isolated_symbol, latest_time=latest_time)
+        with self.db.transaction():
+            self._save_isolated_transfers(transfers, isolated_symbol=isolated_symbol)
 
-        while True:
-            params = {
-                'symbol': isolated_symbol,
-                'current': current,
-                'startTime': latest_time + 1,
-                'size': 100,
-            }
+    def _fetch_isolated_symbol_transfers(self, isolated_symbol: str, latest_time: int) -> List[Dict]:
+        """
+        fetch from the API the transfers made to and from an isolated margin symbol after a given time. This method
+        does not use the database, so it can be called from several threads at once.
 
-            # no built-in method yet in python-binance for margin/interestHistory
-            client_params = {
-                'method': 'get',
-                'path': 'margin/isolated/transfer',
-                'signed': True,
-                'data': params
-            }
-            transfers = self._call_binance_client('_request_margin_api', client_params)
+        :param isolated_symbol: isolated margin symbol of trading
+        :type isolated_symbol: str
+        :param latest_time: millistamp of the latest transfer already saved
+        :type latest_time: int
+        :return: transfers as returned by the API
+        :rtype: List[Dict]
+        """
+        params = {
+            'symbol': isolated_symbol,
+            'startTime': latest_time + 1,
+            'size': BinanceManager.PAGE_SIZE,
+        }
+        # no built-in method yet in python-binance for margin/isolated/transfer
+        request_params = {
+            'method': 'get',
+            'path': 'margin/isolated/transfer',
+            'signed': True
+        }
+        return list(self._paginate('_request_margin_api', params, request_params=request_params))
 
-            for transfer in transfers['rows']:
-                if (transfer['transFrom'], transfer['transTo']) == ('SPOT', 'ISOLATED_MARGIN'):
-                    transfer_type = 'IN'
-                elif (transfer['transFrom'], transfer['transTo']) == ('SPOT', 'ISOLATED_MARGIN'):
-                    transfer_type = 'OUT'
-                else:
-                    raise ValueError(f"unrecognised transfer: {transfer['transFrom']} -> {transfer['transTo']}")
-
-                self.db.add_isolated_transfer(transfer_id=transfer['txId'],
-                                              transfer_type=transfer_type,
-                                              transfer_time=transfer['timestamp'],
-                                              isolated_symbol=isolated_symbol,
-                                              asset=transfer['asset'],
-                                              amount=transfer['amount'],
-                                              auto_commit=False)
-
-            if len(transfers['rows']):
-                current += 1  # next page
-                self.db.commit()
-            else:
-                break
+    def _save_isolated_transfers(self, transfers: List[Dict], isolated_symbol: str):
+        """
+        add isolated margin transfers fetched from the API to the database, without committing
 
-    def update_isolated_margin_interests(self, symbols_info: Optional[List[Dict]] = None):
+        :param transfers: transfers as returned by the API
+        :type transfers: List[Dict]
+        :param isolated_symbol: isolated margin symbol of the transfers
+        :type isolated_symbol: str
+        :return: None
+        :rtype: None
+        """
+        rows = []
+        for transfer in transfers:
+            transfer_type = BinanceManager._ISOLATED_TRANSFER_TYPES.get((transfer['transFrom'], transfer['transTo']))
+            if transfer_type is None:
+                raise ValueError(f"unrecognised transfer: {transfer['transFrom']} -> {transfer['transTo']}")
+
+            rows.append((transfer['txId'], transfer_type, transfer['timestamp'], isolated_symbol,
+                         transfer['asset'], transfer['amount']))
+        self.db.add_isolated_transfers(rows, auto_commit=False)
+
+    def update_isolated_margin_interests(self, symbols_info: Optional[List[Dict]] = None,
+                                         pbar: Optional[tqdm] = None):
         """
-        Update the interests for isolated margin assets
+        Update the interests for isolated margin assets. The symbols are fetched concurrently.
 
         :param symbols_info: details on the symbols to fetch repays on. Each dictionary needs the fields 'asset' and
-            'ref_asset'. If not provided, will update all isolated symbols.
+            'ref_asset'. If not provided, will update the isolated symbols funded by a saved transfer.
         :type symbols_info: Optional[List[Dict]]
+        :param pbar: progress bar shared with other updates, a new one is displayed if not provided
+        :type pbar: Optional[tqdm]
         :return: None
         :rtype: None
         """
-        asset_key = 'asset'
-        ref_asset_key = 'ref_asset'
-        if symbols_info is None:
-            symbols_info = self.get_margin_symbol_info(isolated=True)
-            asset_key = 'base'
-            ref_asset_key = 'quote'
-
-        pbar = tqdm(total=len(symbols_info))
-        for symbol_info in symbols_info:
-            asset = symbol_info[asset_key]
-            ref_asset = symbol_info[ref_asset_key]
-            symbol = symbol_info.get('symbol', f"{asset}{ref_asset}")
-
-            pbar.set_description(f"fetching isolated margin interests for {symbol}")
-            self.update_margin_interests(isolated_symbol=symbol, show_pbar=False)
-            pbar.update()
-
-        pbar.close()
+        symbols = [symbol for symbol, _, _ in self._get_isolated_symbols(symbols_info)]
+        sync_keys = {symbol: self._get_margin_sync_key('interests', isolated_symbol=symbol) for symbol in symbols}
+        symbols = [symbol for symbol in symbols if not self._is_recently_synced(sync_keys[symbol])]
+        sync_time = int(1000 * time.time())
+        fetch_params = [{'latest_time': self.db.get_last_margin_interest_time(isolated_symbol=symbol),
+                         'isolated_symbol': symbol,
+                         'skip_archived': self._is_archive_synced(sync_keys[symbol])}
+                        for symbol in symbols]
+
+        with self._progress_bar(len(symbols), pbar) as pbar, self.db.transaction():
+            for params, interests in self._fetch_concurrently(self._fetch_margin_interests, fetch_params):
+                pbar.set_description(f"fetched isolated margin interests for {params['isolated_symbol']}",
+                                     refresh=False)
+                self._save_margin_interests(interests, isolated_symbol=params['isolated_symbol'])
+                self.db.set_sync_time(sync_keys[params['isolated_symbol']], sync_time, auto_commit=False)
+                pbar.update()
 
     def update_margin_interests(self, isolated_symbol: Optional[str] = None, show_pbar: bool = True):
         """
@@ -338,110 +551,127 @@ class BinanceManager:
         :return:
         :rtype:
         """
+        sync_key = self._get_margin_sync_key('interests', isolated_symbol=isolated_symbol)
+        if self._is_recently_synced(sync_key):
+            return
+        sync_time = int(1000 * time.time())
         margin_type = 'cross' if isolated_symbol is None else 'isolated'
-        latest_time = self.db.get_last_margin_interest_time(isolated_symbol=isolated_symbol)
-        archived = 1000 * time.time() - latest_time > 1000 * 3600 * 24 * 30 * 3
-        current = 1
-        pbar = tqdm(disable=not show_pbar)
         desc = f"fetching {margin_type} margin interests"
         if isolated_symbol is not None:
             desc = desc + f" for {isolated_symbol}"
-        pbar.set_description(desc)
-        while True:
-            params = {
-                'current': current,
-                'startTime': latest_time + 1000,
-                'size': 100,
-                'archived': archived
-            }
-            if isolated_symbol is not None:
-                params['isolatedSymbol'] = isolated_symbol
+        with tqdm(total=1, disable=not show_pbar) as pbar:
+            pbar.set_description(desc, refresh=False)
+            latest_time = self.db.get_last_margin_interest_time(isolated_symbol=isolated_symbol)
+            interests = self._fetch_margin_interests(latest_time=latest_time, isolated_symbol=isolated_symbol,
+                                                     skip_archived=self._is_archive_synced(sync_key))
+            with self.db.transaction():
+                self._save_margin_interests(interests, isolated_symbol=isolated_symbol)
+                self.db.set_sync_time(sync_key, sync_time, auto_commit=False)
+            pbar.update()
 
-            # no built-in method yet in python-binance for margin/interestHistory
-            client_params = {
-                'method': 'get',
-                'path': 'margin/interestHistory',
-                'signed': True,
-                'data': params
-            }
-            interests = self._call_binance_client('_request_margin_api', client_params)
+    def _fetch_margin_interests(self, latest_time: int, isolated_symbol: Optional[str] = None,
+                                skip_archived: bool = False) -> List[Dict]:
+        """
+        fetch from the API the margin interests made after a given time. This method does not use the database, so
+        it can be called from several threads at once.
 
-            for interest in interests['rows']:
-                self.db.add_margin_interest(interest_time=interest['interestAccuredTime'],
-                                            asset=interest['asset'],
-                                            interest=interest['interest'],
-                                            interest_type=interest['type'],
-                                            isolated_symbol=interest.get('isolatedSymbol'),
-                                            auto_commit=False)
+        :param latest_time: millistamp of the latest interest already saved
+        :type latest_time: int
+        :param isolated_symbol: only for isolated margin, provide the trading symbol. Otherwise cross margin data will
+            be fetched
+        :type isolated_symbol: Optional[str]
+        :param skip_archived: if the archived interests are already in the database and should not be fetched again
+        :type skip_archived: bool
+        :return: interests as returned by the API
+        :rtype: List[Dict]
+        """
+        params = {
+            'startTime': latest_time + 1000,
+            'size': BinanceManager.PAGE_SIZE,
+            'archived': not skip_archived and self._is_archived_window(latest_time, int(1000 * time.time()))
+        }
+        if isolated_symbol is not None:
+            params['isolatedSymbol'] = isolated_symbol
 
-            pbar.update()
-            if len(interests['rows']):
-                current += 1  # next page
-                self.db.commit()
-            elif archived:  # switching to non archived interests
-                current = 1
-                archived = False
-                latest_time = self.db.get_last_margin_interest_time(isolated_symbol=isolated_symbol)
-            else:
-                break
-        pbar.close()
+        # no built-in method yet in python-binance for margin/interestHistory
+        request_params = {
+            'method': 'get',
+            'path': 'margin/interestHistory',
+            'signed': True
+        }
+        return list(self._paginate('_request_margin_api', params, time_key='interestAccuredTime',
+                                   request_params=request_params))
 
-    def update_cross_margin_repays(self):
+    def _save_margin_interests(self, interests: List[Dict], isolated_symbol: Optional[str] = None):
         """
-        update the repays for all cross margin assets
+        add margin interests fetched from the API to the database, without committing
 
+        :param interests: interests as returned by the API
+        :type interests: List[Dict]
+        :param isolated_symbol: only for isolated margin, the trading symbol of the interests
+        :type isolated_symbol: Optional[str]
         :return: None
         :rtype: None
         """
-        client_params = {
-            'method': 'get',
-            'path': 'margin/allPairs',
-            'data': {}
-        }
-        symbols_info = self._call_binance_client('_request_margin_api', client_params)  # not built-in yet
-        assets = set()
-        for symbol_info in symbols_info:
-            assets.add(symbol_info['base'])
-            assets.add(symbol_info['quote'])
+        rows = [(interest['interestAccuredTime'], interest['asset'], interest['interest'], interest['type'])
+                for interest in interests]
+        self.db.add_margin_interests(rows, isolated_symbol=isolated_symbol, auto_commit=False)
 
-        pbar = tqdm(total=len(assets))
-        for asset in assets:
-            pbar.set_description(f"fetching {asset} cross margin repays")
-            self.update_margin_asset_repay(asset=asset)
-            pbar.update()
-        pbar.close()
+    def update_cross_margin_repays(self):
+        """
+        update the repays for all cross margin assets
 
-    def update_isolated_margin_repays(self, symbols_info: Optional[List[Dict]] = None):
+        :return: None
+        :rtype: None
+        """
+        _, assets = self.get_cross_margin_pairs()
+        sync_keys = {asset: self._get_margin_sync_key('repays', asset) for asset in assets}
+        assets = [asset for asset in assets if not self._is_recently_synced(sync_keys[asset])]
+        sync_time = int(1000 * time.time())
+        latest_times = {asset: self.db.get_last_repay_time(asset=asset) for asset in assets}
+        fetch_params = [{'asset': asset, 'latest_time': latest_times[asset],
+                         'skip_archived': self._is_archive_synced(sync_keys[asset])}
+                        for asset in assets]
+
+        with self._progress_bar(len(assets)) as pbar, self.db.transaction():
+            for params, repays in self._fetch_concurrently(self._fetch_margin_asset_repays, fetch_params):
+                pbar.set_description(f"fetched {params['asset']} cross margin repays", refresh=False)
+                self._save_margin_repays(repays)
+                self.db.set_sync_time(sync_keys[params['asset']], sync_time, auto_commit=False)
+                pbar.update()
+
+    def update_isolated_margin_repays(self, symbols_info: Optional[List[Dict]] = None,
+                                      pbar: Optional[tqdm] = None):
         """
-        Update the repays for isolated margin assets
+        Update the repays for isolated margin assets. The assets of the symbols are fetched concurrently.
 
         :param symbols_info: details on the symbols to fetch repays on. Each dictionary needs the fields 'asset' and
-            'ref_asset'. If not provided, will update all isolated symbols.
+            'ref_asset'. If not provided, will update the isolated symbols funded by a saved transfer.
         :type symbols_info: Optional[List[Dict]]
+        :param pbar: progress bar shared with other updates, a new one is displayed if not provided
+        :type pbar: Optional[tqdm]
         :return: None
         :rtype: None
         """
-        asset_key = 'asset'
-        ref_asset_key = 'ref_asset'
-        if symbols_info is None:
-            symbols_info = self.get_margin_symbol_info(isolated=True)
-            asset_key = 'base'
-            ref_asset_key = 'quote'
-
-        pbar = tqdm(total=2 * len(symbols_info))
-        for symbol_info in symbols_info:
-            asset = symbol_info[asset_key]
-            ref_asset = symbol_info[ref_asset_key]
-            symbol = symbol_info.get('symbol', f"{asset}{ref_asset}")
-
-            pbar.set_description(f"fetching {asset} isolated margin repays for {symbol}")
-            self.update_margin_asset_repay(asset=asset, isolated_symbol=symbol)
-            pbar.update()
-
-            pbar.set_description(f"fetching {ref_asset} isolated margin repays for {symbol}")
-            self.update_margin_asset_repay(asset=ref_asset, isolated_symbol=symbol)
-            pbar.update()
-        pbar.close()
+        symbols_assets = [(symbol, asset) for symbol, base, quote in self._get_isolated_symbols(symbols_info)
+                          for asset in (base, quote)]
+        sync_keys = {(symbol, asset): self._get_margin_sync_key('repays', asset, symbol)
+                     for symbol, asset in symbols_assets}
+        symbols_assets = [key for key in symbols_assets if not self._is_recently_synced(sync_keys[key])]
+        sync_time = int(1000 * time.time())
+        fetch_params = [{'asset': asset,
+                         'latest_time': self.db.get_last_repay_time(asset=asset, isolated_symbol=symbol),
+                         'isolated_symbol': symbol,
+                         'skip_archived': self._is_archive_synced(sync_keys[(symbol, asset)])}
+                        for symbol, asset in symbols_assets]
+
+        with self._progress_bar(len(symbols_assets), pbar) as pbar, self.db.transaction():
+            for params, repays in self._fetch_concurrently(self._fetch_margin_asset_repays, fetch_params):
+                pbar.set_description(f"fetched {params['asset']} repays for {params['isolated_symbol']}", refresh=False)
+                self._save_margin_repays(repays, isolated_symbol=params['isolated_symbol'])
+                self.db.set_sync_time(sync_keys[(params['isolated_symbol'], params['asset'])], sync_time,
+                                      auto_commit=False)
+                pbar.update()
 
     def update_margin_asset_repay(self, asset: str, isolated_symbol: Optional[str] = None):
         """
@@ -459,98 +689,116 @@ class BinanceManager:
         :return: None
         :rtype: None
         """
+        sync_key = self._get_margin_sync_key('repays', asset, isolated_symbol)
+        if self._is_recently_synced(sync_key):
+            return
+        sync_time = int(1000 * time.time())
         latest_time = self.db.get_last_repay_time(asset=asset, isolated_symbol=isolated_symbol)
-        archived = 1000 * time.time() - latest_time > 1000 * 3600 * 24 * 30 * 3
-        current = 1
-        while True:
-            client_params = {
-                'asset': asset,
-                'current': current,
-                'startTime': latest_time + 1000,
-                'archived': archived,
-                'size': 100
-            }
-            if isolated_symbol is not None:
-                client_params['isolatedSymbol'] = isolated_symbol
-            repays = self._call_binance_client('get_margin_repay_details', client_params)
-
-            for repay in repays['rows']:
-                if repay['status'] == 'CONFIRMED':
-                    self.db.add_repay(tx_id=repay['txId'],
-                                      repay_time=repay['timestamp'],
-                                      asset=repay['asset'],
-                                      principal=repay['principal'],
-                                      interest=repay['interest'],
-                                      isolated_symbol=repay.get('isolatedSymbol', None),
-                                      auto_commit=False)
+        repays = self._fetch_margin_asset_repays(asset=asset, latest_time=latest_time, isolated_symbol=isolated_symbol,
+                                                 skip_archived=self._is_archive_synced(sync_key))
+        with self.db.transaction():
+            self._save_margin_repays(repays, isolated_symbol=isolated_symbol)
+            self.db.set_sync_time(sync_key, sync_time, auto_commit=False)
+
+    def _fetch_margin_asset_repays(self, asset: str, latest_time: int, isolated_symbol: Optional[str] = None,
+                                   skip_archived: bool = False) -> List[Dict]:
+        """
+        fetch from the API the confirmed repays of an asset made after a given time. This method does not use the
+        database, so it can be called from several threads at once.
 
-            if len(repays['rows']):
-                current += 1  # next page
-                self.db.commit()
-            elif archived:  # switching to non archived repays
-                current = 1
-                archived = False
-                latest_time = self.db.get_last_repay_time(asset=asset)
-            else:
-                break
+        :param asset: asset for the repays
+        :type asset: str
+        :param latest_time: millistamp of the latest repay already saved
+        :type latest_time: int
+        :param isolated_symbol: only for isolated margin, provide the trading symbol. Otherwise cross margin data will
+            be fetched
+        :type isolated_symbol: Optional[str]
+        :param skip_archived: if the archived repays are already in the database and should not be fetched again
+        :type skip_archived: bool
+        :return: confirmed repays as returned by the API
+        :rtype: List[Dict]
+        """
+        client_params = {
+            'asset': asset,
+            'startTime': latest_time + 1000,
+            'archived': not skip_archived and self._is_archived_window(latest_time, int(1000 * time.time())),
+            'size': BinanceManager.PAGE_SIZE
+        }
+        if isolated_symbol is not None:
+            client_params['isolatedSymbol'] = isolated_symbol
+        return [repay for repay in self._paginate('get_margin_repay_details', client_params, time_key='timestamp')
+                if repay['status'] == 'CONFIRMED']
 
-    def update_cross_margin_loans(self):
+    def _save_margin_repays(self, repays: List[Dict], isolated_symbol: Optional[str] = None):
         """
-        update the loans for all cross margin assets
+        add repays fetched from the API to the database, without committing
 
+        :param repays: repays as returned by the API
+        :type repays: List[Dict]
+        :param isolated_symbol: only for isolated margin, the trading symbol of the repays
+        :type isolated_symbol: Optional[str]
         :return: None
         :rtype: None
         """
-        client_params = {
-            'method': 'get',
-            'path': 'margin/allPairs',
-            'data': {}
-        }
-        symbols_info = self._call_binance_client('_request_margin_api', client_params)  # not built-in yet
-        assets = set()
-        for symbol_info in symbols_info:
-            assets.add(symbol_info['base'])
-            assets.add(symbol_info['quote'])
+        rows = [(repay['txId'], repay['timestamp'], repay['asset'], repay['principal'], repay['interest'])
+                for repay in repays]
+        self.db.add_repays(rows, isolated_symbol=isolated_symbol, auto_commit=False)
 
-        pbar = tqdm(total=len(assets))
-        for asset in assets:
-            pbar.set_description(f"fetching {asset} cross margin loans")
-            self.update_margin_asset_loans(asset=asset)
-            pbar.update()
-        pbar.close()
+    def update_cross_margin_loans(self):
+        """
+        update the loans for all cross margin assets
 
-    def update_isolated_margin_loans(self, symbols_info: Optional[List[Dict]] = None):
+        :return: None
+        :rtype: None
         """
-        Update the loans for isolated margin assets
+        _, assets = self.get_cross_margin_pairs()
+        sync_keys = {asset: self._get_margin_sync_key('loans', asset) for asset in assets}
+        assets = [asset for asset in assets if not self._is_recently_synced(sync_keys[asset])]
+        sync_time = int(1000 * time.time())
+        latest_times = {asset: self.db.get_last_loan_time(asset=asset) for asset in assets}
+        fetch_params = [{'asset': asset, 'latest_time': latest_times[asset],
+                         'skip_archived': self._is_archive_synced(sync_keys[asset])}
+                        for asset in assets]
+
+        with self._progress_bar(len(assets)) as pbar, self.db.transaction():
+            for params, loans in self._fetch_concurrently(self._fetch_margin_asset_loans, fetch_params):
+                pbar.set_description(f"fetched {params['asset']} cross margin loans", refresh=False)
+                self._save_margin_loans(loans)
+                self.db.set_sync_time(sync_keys[params['asset']], sync_time, auto_commit=False)
+                pbar.update()
+
+    def update_isolated_margin_loans(self, symbols_info: Optional[List[Dict]] = None,
+                                     pbar: Optional[tqdm] = None):
+        """
+        Update the loans for isolated margin assets. The assets of the symbols are fetched concurrently.
 
         :param symbols_info: details on the symbols to fetch loans on. Each dictionary needs the fields 'asset' and
-            'ref_asset'. If not provided, will update all isolated symbols.
+            'ref_asset'. If not provided, will update the isolated symbols funded by a saved transfer.
         :type symbols_info: Optional[List[Dict]]
+        :param pbar: progress bar shared with other updates, a new one is displayed if not provided
+        :type pbar: Optional[tqdm]
         :return: None
         :rtype: None
         """
-        asset_key = 'asset'
-        ref_asset_key = 'ref_asset'
-        if symbols_info is None:
-            symbols_info = self.get_margin_symbol_info(isolated=True)
-            asset_key = 'base'
-            ref_asset_key = 'quote'
-
-        pbar = tqdm(total=2 * len(symbols_info))
-        for symbol_info in symbols_info:
-            asset = symbol_info[asset_key]
-            ref_asset = symbol_info[ref_asset_key]
-            symbol = symbol_info.get('symbol', f"{asset}{ref_asset}")
-
-            pbar.set_description(f"fetching {asset} isolated margin loans for {symbol}")
-            self.update_margin_asset_loans(asset=asset, isolated_symbol=symbol)
-            pbar.update()
-
-            pbar.set_description(f"fetching {ref_asset} isolated margin loans for {symbol}")
-            self.update_margin_asset_loans(asset=ref_asset, isolated_symbol=symbol)
-            pbar.update()
-
-        pbar.close()
+        symbols_assets = [(symbol, asset) for symbol, base, quote in self._get_isolated_symbols(symbols_info)
+                          for asset in (base, quote)]
+        sync_keys = {(symbol, asset): self._get_margin_sync_key('loans', asset, symbol)
+                     for symbol, asset in symbols_assets}
+        symbols_assets = [key for key in symbols_assets if not self._is_recently_synced(sync_keys[key])]
+        sync_time = int(1000 * time.time())
+        fetch_params = [{'asset': asset,
+                         'latest_time': self.db.get_last_loan_time(asset=asset, isolated_symbol=symbol),
+                         'isolated_symbol': symbol,
+                         'skip_archived': self._is_archive_synced(sync_keys[(symbol, asset)])}
+                        for symbol, asset in symbols_assets]
+
+        with self._progress_bar(len(symbols_assets), pbar) as pbar, self.db.transaction():
+            for params, loans in self._fetch_concurrently(self._fetch_margin_asset_loans, fetch_params):
+                pbar.set_description(f"fetched {params['asset']} loans for {params['isolated_symbol']}", refresh=False)
+                self._save_margin_loans(loans, isolated_symbol=params['isolated_symbol'])
+                self.db.set_sync_time(sync_keys[(params['isolated_symbol'], params['asset'])], sync_time,
+                                      auto_commit=False)
+                pbar.update()
 
     def update_margin_asset_loans(self, asset: str, isolated_symbol: Optional[str] = None):
         """
@@ -568,39 +816,59 @@ class BinanceManager:
         :return: None
         :rtype: None
         """
+        sync_key = self._get_margin_sync_key('loans', asset, isolated_symbol)
+        if self._is_recently_synced(sync_key):
+            return
+        sync_time = int(1000 * time.time())
         latest_time = self.db.get_last_loan_time(asset=asset, isolated_symbol=isolated_symbol)
-        archived = 1000 * time.time() - latest_time > 1000 * 3600 * 24 * 30 * 3
-        current = 1
-        while True:
-            client_params = {
-                'asset': asset,
-                'current': current,
-                'startTime': latest_time + 1000,
-                'archived': archived,
-                'size': 100
-            }
-            if isolated_symbol is not None:
-                client_params['isolatedSymbol'] = isolated_symbol
-            loans = self._call_binance_client('get_margin_loan_details', client_params)
-
-            for loan in loans['rows']:
-                if loan['status'] == 'CONFIRMED':
-                    self.db.add_loan(tx_id=loan['txId'],
-                                     loan_time=loan['timestamp'],
-                                     asset=loan['asset'],
-                                     principal=loan['principal'],
-                                     isolated_symbol=loan.get('isolatedSymbol'),
-                                     auto_commit=False)
-
-            if len(loans['rows']):
-                current += 1  # next page
-                self.db.commit()
-            elif archived:  # switching to non archived loans
-                current = 1
-                archived = False
-                latest_time = self.db.get_last_loan_time(asset=asset, isolated_symbol=isolated_symbol)
-            else:
-                break
+        loans = self._fetch_margin_asset_loans(asset=asset, latest_time=latest_time, isolated_symbol=isolated_symbol,
+                                               skip_archived=self._is_archive_synced(sync_key))
+        with self.db.transaction():
+            self._save_margin_loans(loans, isolated_symbol=isolated_symbol)
+            self.db.set_sync_time(sync_key, sync_time, auto_commit=False)
+
+    def _fetch_margin_asset_loans(self, asset: str, latest_time: int, isolated_symbol: Optional[str] = None,
+                                  skip_archived: bool = False) -> List[Dict]:
+        """
+        fetch from the API the confirmed loans of an asset made after a given time. This method does not use the
+        database, so it can be called from several threads at once.
+
+        :param asset: asset for the loans
+        :type asset: str
+        :param latest_time: millistamp of the latest loan already saved
+        :type latest_time: int
+        :param isolated_symbol: only for isolated margin, provide the trading symbol. Otherwise cross margin data will
+            be fetched
+        :type isolated_symbol: Optional[str]
+        :param skip_archived: if the archived loans are already in the database and should not be fetched again
+        :type skip_archived: bool
+        :return: confirmed loans as returned by the API
+        :rtype: List[Dict]
+        """
+        client_params = {
+            'asset': asset,
+            'startTime': latest_time + 1000,
+            'archived': not skip_archived and self._is_archived_window(latest_time, int(1000 * time.time())),
+            'size': BinanceManager.PAGE_SIZE
+        }
+        if isolated_symbol is not None:
+            client_params['isolatedSymbol'] = isolated_symbol
+        return [loan for loan in self._paginate('get_margin_loan_details', client_params, time_key='timestamp')
+                if loan['status'] == 'CONFIRMED']
+
+    def _save_margin_loans(self, loans: List[Dict], isolated_symbol: Optional[str] = None):
+        """
+        add loans fetched from the API to the database, without committing
+
+        :param loans: loans as returned by the API
+        :type loans: List[Dict]
+        :param isolated_symbol: only for isolated margin, the trading symbol of the loans
+        :type isolated_symbol: Optional[str]
+        :return: None
+        :rtype: None
+        """
+        rows = [(loan['txId'], loan['timestamp'], loan['asset'], loan['principal']) for loan in loans]
+        self.db.add_loans(rows, isolated_symbol=isolated_symbol, auto_commit=False)
 
     def update_margin_symbol_trades(self, asset: str, ref_asset: str, is_isolated: bool = False, limit: int = 1000):
         """
@@ -623,37 +891,56 @@ class BinanceManager:
         :rtype: None
         """
         trade_type = 'isolated_margin' if is_isolated else 'cross_margin'
-        limit = min(1000, limit)
+        limit = max(1, min(1000, limit))
         symbol = asset + ref_asset
         last_trade_id = self.db.get_max_trade_id(asset, ref_asset, trade_type)
-        while True:
-            client_params = {
-                'symbol': symbol,
-                'fromId': last_trade_id + 1,
-                'isIsolated': is_isolated,
-                'limit': limit
-            }
-            new_trades = self._call_binance_client('get_margin_trades', client_params)
-
-            for trade in new_trades:
-                self.db.add_trade(trade_type=trade_type,
-                                  trade_id=int(trade['id']),
-                                  trade_time=int(trade['time']),
-                                  asset=asset,
-                                  ref_asset=ref_asset,
-                                  qty=float(trade['qty']),
-                                  price=float(trade['price']),
-                                  fee=float(trade['commission']),
-                                  fee_asset=trade['commissionAsset'],
-                                  is_buyer=trade['isBuyer'],
-                                  symbol=symbol,
-                                  auto_commit=False
-                                  )
-                last_trade_id = max(last_trade_id, int(trade['id']))
-            if len(new_trades):
-                self.db.commit()
-            if len(new_trades) < limit:
-                break
+        trades = self._fetch_margin_symbol_trades(symbol=symbol, last_trade_id=last_trade_id, is_isolated=is_isolated,
+                                                  limit=limit)
+        with self.db.transaction():
+            self._save_margin_trades(trades, asset=asset, ref_asset=ref_asset, is_isolated=is_isolated)
+
+    def _fetch_margin_symbol_trades(self, symbol: str, last_trade_id: int, is_isolated: bool = False,
+                                    limit: int = 1000) -> List[Dict]:
+        """
+        fetch from the API the margin trades of a trading pair made after a given trade id. This method does not use
+        the database, so it can be called from several threads at once.
+
+        :param symbol: trading pair (ex 'BTCUSDT')
+        :type symbol: str
+        :param last_trade_id: id of the latest trade already saved
+        :type last_trade_id: int
+        :param is_isolated: if margin type is isolated, default False
+        :type is_isolated: bool
+        :param limit: max size of each trade requests
+        :type limit: int
+        :return: trades as returned by the API
+        :rtype: List[Dict]
+        """
+        client_params = {
+            'symbol': symbol,
+            'isIsolated': is_isolated,
+            'limit': max(1, min(1000, limit))
+        }
+        return self._fetch_from_id('get_margin_trades', client_params, last_trade_id)
+
+    def _save_margin_trades(self, trades: List[Dict], asset: str, ref_asset: str, is_isolated: bool = False):
+        """
+        add margin trades fetched from the API to the database, without committing
+
+        :param trades: trades as returned by the API
+        :type trades: List[Dict]
+        :param asset: name of the asset in the trading pair (ex 'BTC' for 'BTCUSDT')
+        :type asset: string
+        :param ref_asset: name of the reference asset in the trading pair (ex 'USDT' for 'BTCUSDT')
+        :type ref_asset: string
+        :param is_isolated: if margin type is isolated, default False
+        :type is_isolated: bool
+        :return: None
+        :rtype: None
+        """
+        trade_type = 'isolated_margin' if is_isolated else 'cross_margin'
+        rows = self._parse_trades(trades, asset=asset, ref_asset=ref_asset)
+        self.db.add_trades(trade_type, rows, symbol=asset + ref_asset, auto_commit=False)
 
     def update_all_cross_margin_trades(self, limit: int = 1000):
         """
@@ -664,56 +951,83 @@ class BinanceManager:
         :return: None
         :rtype: None
         """
-        client_params = {
-            'method': 'get',
-            'path': 'margin/allPairs',
-            'data': {}
-        }
-        symbols_info = self._call_binance_client('_request_margin_api', client_params)  # not built-in yet
+        symbols_info, _ = self.get_cross_margin_pairs()
 
-        pbar = tqdm(total=len(symbols_info))
+        fetch_params = []
         for symbol_info in symbols_info:
-            pbar.set_description(f"fetching {symbol_info['symbol']} cross margin trades")
-            self.update_margin_symbol_trades(asset=symbol_info['base'],
-                                             ref_asset=symbol_info['quote'],
-                                             limit=limit)
-            pbar.update()
-        pbar.close()
-
-    def update_isolated_margin_trades(self, symbols_info: Optional[List[Dict]] = None):
+            last_trade_id = self.db.get_max_trade_id(symbol_info['base'], symbol_info['quote'], 'cross_margin')
+            fetch_params.append({'symbol': symbol_info['base'] + symbol_info['quote'],
+                                 'last_trade_id': last_trade_id,
+                                 'limit': limit})
+        symbols_assets = {symbol_info['base'] + symbol_info['quote']: (symbol_info['base'], symbol_info['quote'])
+                          for symbol_info in symbols_info}
+
+        uncommitted_rows = 0
+        with self._progress_bar(len(symbols_info)) as pbar, self.db.transaction():
+            for params, trades in self._fetch_concurrently(self._fetch_margin_symbol_trades, fetch_params):
+                pbar.set_description(f"fetched {params['symbol']} cross margin trades", refresh=False)
+                asset, ref_asset = symbols_assets[params['symbol']]
+                self._save_margin_trades(trades, asset=asset, ref_asset=ref_asset)
+                uncommitted_rows += len(trades)
+                if uncommitted_rows >= BinanceManager.COMMIT_ROWS_INTERVAL:  # bound the work lost on a failure
+                    self.db.checkpoint()
+                    uncommitted_rows = 0
+                pbar.update()
+
+    def update_isolated_margin_trades(self, symbols_info: Optional[List[Dict]] = None,
+                                      pbar: Optional[tqdm] = None):
         """
-        This update the isolated margin trades in the database for every trading pairs
+        This update the isolated margin trades in the database for every trading pairs. The trading pairs are fetched
+        concurrently and saved as they complete.
 
         :param symbols_info: details on the symbols to fetch trades on. Each dictionary needs the fields 'asset' and
-            'ref_asset'. If not provided, will update all isolated symbols.
+            'ref_asset'. If not provided, will update the isolated symbols funded by a saved transfer.
         :type symbols_info: Optional[List[Dict]]
+        :param pbar: progress bar shared with other updates, a new one is displayed if not provided
+        :type pbar: Optional[tqdm]
         :return: None
         :rtype: None
         """
-        asset_key = 'asset'
-        ref_asset_key = 'ref_asset'
-        if symbols_info is None:
-            symbols_info = self.get_margin_symbol_info(isolated=True)
-            asset_key = 'base'
-            ref_asset_key = 'quote'
-
-        pbar = tqdm(total=len(symbols_info))
-        for symbol_info in symbols_info:
-            asset = symbol_info[asset_key]
-            ref_asset = symbol_info[ref_asset_key]
-            symbol = symbol_info.get('symbol', f"{asset}{ref_asset}")
-            pbar.set_description(f"fetching {symbol} isolated margin trades")
+        symbols = self._get_isolated_symbols(symbols_info)
+        fetch_params = [{'symbol': symbol,
+                         'last_trade_id': self.db.get_max_trade_id(asset, ref_asset, 'isolated_margin'),
+                         'is_isolated': True,
+                         'limit': 1000}
+                        for symbol, asset, ref_asset in symbols]
+        symbols_assets = {symbol: (asset, ref_asset) for symbol, asset, ref_asset in symbols}
+
+        uncommitted_rows = 0
+        with self._progress_bar(len(symbols), pbar) as pbar, self.db.transaction():
+            for params, trades in self._fetch_concurrently(self._fetch_isolated_symbol_trades, fetch_params):
+                pbar.set_description(f"fetched {params['symbol']} isolated margin trades", refresh=False)
+                if trades is None:  # remember the symbol, so that it is not requested again by the next updates
+                    self.db.set_sync_time(self._get_unused_symbol_key(params['symbol']), int(1000 * time.time()),
+                                          auto_commit=False)
+                else:
+                    asset, ref_asset = symbols_assets[params['symbol']]
+                    self._save_margin_trades(trades, asset=asset, ref_asset=ref_asset, is_isolated=True)
+                    uncommitted_rows += len(trades)
+                    if uncommitted_rows >= BinanceManager.COMMIT_ROWS_INTERVAL:  # bound the work lost on a failure
+                        self.db.checkpoint()
+                        uncommitted_rows = 0
+                pbar.update()
+
+    def _fetch_isolated_symbol_trades(self, **kwargs) -> Optional[List[Dict]]:
+        """
+        fetch the trades of an isolated margin symbol like _fetch_margin_symbol_trades, but return None if the
+        isolated symbol has never been used
 
-            try:
-                self.update_margin_symbol_trades(asset=asset,
-                                                 ref_asset=ref_asset,
-                                                 limit=1000,
-                                                 is_isolated=True)
-            except BinanceAPIException as e:
-                if e.code != -11001:  # -11001 means that this isolated pair has never been used
-                    raise e
-            pbar.update()
-        pbar.close()
+        :param kwargs: parameters of _fetch_margin_symbol_trades
+        :type kwargs: Dict
+        :return: trades as returned by the API, None if the symbol has never been used
+        :rtype: Optional[List[Dict]]
+        """
+        try:
+            return self._fetch_margin_symbol_trades(**kwargs)
+        except BinanceAPIException as e:
+            if e.code != -11001:  # -11001 means that this isolated pair has never been used
+                raise e
+            return None
 
     def update_lending_redemptions(self):
         """
@@ -726,36 +1040,13 @@ class BinanceManager:
         :return: None
         :rtype: None
         """
-        lending_types = ['DAILY', 'ACTIVITY', 'CUSTOMIZED_FIXED']
-        pbar = tqdm(total=3)
-        for lending_type in lending_types:
-            pbar.set_description(f"fetching lending redemptions of type {lending_type}")
-            latest_time = self.db.get_last_lending_redemption_time(lending_type=lending_type) + 1
-            current = 1
-            while True:
-                client_params = {
-                    'lendingType': lending_type,
-                    'startTime': latest_time,
-                    'current': current,
-                    'size': 100
-                }
-                lending_redemptions = self._call_binance_client('get_lending_redemption_history', client_params)
-
-                for li in lending_redemptions:
-                    if li['status'] == 'PAID':
-                        self.db.add_lending_redemption(redemption_time=li['createTime'],
-                                                       lending_type=lending_type,
-                                                       asset=li['asset'],
-                                                       amount=li['amount']
-                                                       )
-
-                if len(lending_redemptions):
-                    current += 1  # next page
-                    self.db.commit()
-                else:
-                    break
-            pbar.update()
-        pbar.close()
+        self._update_lending(data_name='redemptions',
+                             method_name='get_lending_redemption_history',
+                             get_last_time=self.db.get_last_lending_redemption_time,
+                             parse_rows=lambda redemptions, lending_type: [
+                                 (li['createTime'], lending_type, li['asset'], li['amount'])
+                                 for li in redemptions if li['status'] == 'PAID'],
+                             add_rows=self.db.add_lending_redemptions)
 
     def update_lending_purchases(self):
         """
@@ -768,37 +1059,13 @@ class BinanceManager:
         :return: None
         :rtype: None
         """
-        lending_types = ['DAILY', 'ACTIVITY', 'CUSTOMIZED_FIXED']
-        pbar = tqdm(total=3)
-        for lending_type in lending_types:
-            pbar.set_description(f"fetching lending purchases of type {lending_type}")
-            latest_time = self.db.get_last_lending_purchase_time(lending_type=lending_type) + 1
-            current = 1
-            while True:
-                client_params = {
-                    'lendingType': lending_type,
-                    'startTime': latest_time,
-                    'current': current,
-                    'size': 100
-                }
-                lending_purchases = self._call_binance_client('get_lending_purchase_history', client_params)
-
-                for li in lending_purchases:
-                    if li['status'] == 'SUCCESS':
-                        self.db.add_lending_purchase(purchase_id=li['purchaseId'],
-                                                     purchase_time=li['createTime'],
-                                                     lending_type=li['lendingType'],
-                                                     asset=li['asset'],
-                                                     amount=li['amount']
-                                                     )
-
-                if len(lending_purchases):
-                    current += 1  # next page
-                    self.db.commit()
-                else:
-                    break
-            pbar.update()
-        pbar.close()
+        self._update_lending(data_name='purchases',
+                             method_name='get_lending_purchase_history',
+                             get_last_time=self.db.get_last_lending_purchase_time,
+                             parse_rows=lambda purchases, lending_type: [
+                                 (li['purchaseId'], li['createTime'], li['lendingType'], li['asset'], li['amount'])
+                                 for li in purchases if li['status'] == 'SUCCESS'],
+                             add_rows=self.db.add_lending_purchases)
 
     def update_lending_interests(self):
         """
@@ -811,40 +1078,51 @@ class BinanceManager:
         :return: None
         :rtype: None
         """
-        lending_types = ['DAILY', 'ACTIVITY', 'CUSTOMIZED_FIXED']
-        pbar = tqdm(total=3)
-        for lending_type in lending_types:
-            pbar.set_description(f"fetching lending interests of type {lending_type}")
-            latest_time = self.db.get_last_lending_interest_time(lending_type=lending_type) + 3600 * 1000  # add 1 hour
-            current = 1
-            while True:
+        self._update_lending(data_name='interests',
+                             method_name='get_lending_interest_history',
+                             get_last_time=self.db.get_last_lending_interest_time,
+                             parse_rows=lambda interests, lending_type: [
+                                 (li['time'], li['lendingType'], li['asset'], li['interest']) for li in interests],
+                             add_rows=self.db.add_lending_interests,
+                             time_offset=3600 * 1000)  # interests are distributed at most once per hour
+
+    def _update_lending(self, data_name: str, method_name: str, get_last_time: Callable[..., int],
+                        parse_rows: Callable[[List[Dict], str], List[Tuple]], add_rows: Callable[..., None],
+                        time_offset: int = 1):
+        """
+        update a lending history for every lending type, in a single transaction
+
+        :param data_name: name of the data for the progress bar (ex: 'purchases')
+        :type data_name: str
+        :param method_name: name of the method binance.Client returning the history
+        :type method_name: str
+        :param get_last_time: method of the database returning the latest time saved for a lending type
+        :type get_last_time: Callable[..., int]
+        :param parse_rows: function converting a page of the history and its lending type to database rows
+        :type parse_rows: Callable[[List[Dict], str], List[Tuple]]
+        :param add_rows: method of the database adding the rows
+        :type add_rows: Callable[..., None]
+        :param time_offset: milliseconds to add to the latest time saved to get the start time of the history
+        :type time_offset: int
+        :return: None
+        :rtype: None
+        """
+        with self._progress_bar(len(BinanceManager.LENDING_TYPES)) as pbar, self.db.transaction():
+            for lending_type in BinanceManager.LENDING_TYPES:
+                pbar.set_description(f"fetching lending {data_name} of type {lending_type}", refresh=False)
                 client_params = {
                     'lendingType': lending_type,
-                    'startTime': latest_time,
-                    'current': current,
-                    'size': 100
+                    'startTime': get_last_time(lending_type=lending_type) + time_offset,
+                    'size': BinanceManager.PAGE_SIZE
                 }
-                lending_interests = self._call_binance_client('get_lending_interest_history', client_params)
-
-                for li in lending_interests:
-                    self.db.add_lending_interest(time=li['time'],
-                                                 lending_type=li['lendingType'],
-                                                 asset=li['asset'],
-                                                 amount=li['interest']
-                                                 )
-
-                if len(lending_interests):
-                    current += 1  # next page
-                    self.db.commit()
-                else:
-                    break
-            pbar.update()
-        pbar.close()
+                for page in self._fetch_pages(method_name, client_params):
+                    add_rows(parse_rows(page, lending_type), auto_commit=False)
+                pbar.update()
 
     def update_spot_dusts(self):
         """
-        update the dust database. As there is no way to get the dust by id or timeframe, the table is cleared
-        for each update
+        update the dust database. As there is no way to get the dust by id or timeframe, the whole dust log is
+        fetched and only the transactions not already saved are added
 
         sources:
         https://python-binance.readthedocs.io/en/latest/binance.html#binance.client.Client.get_dust_log
@@ -853,30 +1131,29 @@ class BinanceManager:
         :return: None
         :rtype: None
         """
-        self.db.drop_table(tables.SPOT_DUST_TABLE)
-
         result = self._call_binance_client('get_dust_log')
         dusts = result['results']
-        pbar = tqdm(total=dusts['total'])
-        pbar.set_description("fetching spot dusts")
-        for d in dusts['rows']:
-            for sub_dust in d['logs']:
-                date_time = dateparser.parse(sub_dust['operateTime'] + 'Z')
-                self.db.add_spot_dust(tran_id=sub_dust['tranId'],
-                                      time=datetime_to_millistamp(date_time),
-                                      asset=sub_dust['fromAsset'],
-                                      asset_amount=sub_dust['amount'],
-                                      bnb_amount=sub_dust['transferedAmount'],
-                                      bnb_fee=sub_dust['serviceChargeAmount'],
-                                      auto_commit=False
-                                      )
-            pbar.update()
-        self.db.commit()
-        pbar.close()
+        saved_tran_ids = self.db.get_spot_dust_tran_ids()  # exact set of the seen ids, loaded once per update
+        with self._progress_bar(dusts['total']) as pbar, self.db.transaction():
+            pbar.set_description("fetching spot dusts", refresh=False)
+            for d in dusts['rows']:
+                rows = []
+                for sub_dust in d['logs']:
+                    if int(sub_dust['tranId']) in saved_tran_ids:
+                        continue
+                    date_time = datetime.datetime.strptime(sub_dust['operateTime'], '%Y-%m-%d %H:%M:%S')
+                    date_time = date_time.replace(tzinfo=datetime.timezone.utc)  # operateTime is in UTC
+                    rows.append((sub_dust['tranId'], datetime_to_millistamp(date_time), sub_dust['fromAsset'],
+                                 sub_dust['amount'], sub_dust['transferedAmount'], sub_dust['serviceChargeAmount']))
+                self.db.add_spot_dusts(rows, auto_commit=False)
+                # the sub dusts of a transaction share its id: mark it as seen only once the whole transaction is added
+                saved_tran_ids.update(int(row[0]) for row in rows)
+                pbar.update()
 
     def update_spot_dividends(self, day_jump: float = 90, limit: int = 500):
         """
-        update the dividends database (earnings distributed by Binance)
+        update the dividends database (earnings distributed by Binance). The time windows are fetched concurrently.
+
         sources:
         https://python-binance.readthedocs.io/en/latest/binance.html#binance.client.Client.get_asset_dividend_history
         https://binance-docs.github.io/apidocs/spot/en/#asset-dividend-record-user_data
@@ -888,18 +1165,45 @@ class BinanceManager:
         :return: None
         :rtype: None
         """
-        limit = min(500, limit)
-        delta_jump = min(day_jump, 90) * 24 * 3600 * 1000
+        limit = max(1, min(500, limit))
+        delta_jump = int(min(day_jump, 90) * 24 * 3600 * 1000)
+        if self._is_recently_synced('spot_dividends'):
+            return
         start_time = self.db.get_last_spot_dividend_time() + 1
-        now_millistamp = datetime_to_millistamp(datetime.datetime.now(tz=datetime.timezone.utc))
-        pbar = tqdm(total=math.ceil((now_millistamp - start_time) / delta_jump))
-        pbar.set_description("fetching spot dividends")
-        while start_time < now_millistamp:
+        now_millistamp = int(1000 * time.time())
+        windows = self._get_time_windows(start_time, now_millistamp, delta_jump)
+        fetch_params = [{'start_time': window_start, 'end_time': window_end, 'limit': limit}
+                        for window_start, window_end in windows]
+        with self._progress_bar(len(fetch_params)) as pbar, self.db.transaction():
+            pbar.set_description("fetching spot dividends", refresh=False)
+            for _, dividends in self._fetch_concurrently(self._fetch_spot_dividends, fetch_params):
+                rows = [(int(div['tranId']), int(div['divTime']), div['asset'], float(div['amount']))
+                        for div in dividends]
+                self.db.add_dividends(rows, auto_commit=False)
+                pbar.update()
+            self.db.set_sync_time('spot_dividends', now_millistamp, auto_commit=False)
+
+    def _fetch_spot_dividends(self, start_time: int, end_time: int, limit: int) -> List[Dict]:
+        """
+        fetch from the API the dividends distributed in a time window. This method does not use the database, so it
+        can be called from several threads at once.
+
+        :param start_time: millistamp of the beginning of the window
+        :type start_time: int
+        :param end_time: millistamp of the end of the window, included
+        :type end_time: int
+        :param limit: max number of dividends to retrieve per call, max is 500
+        :type limit: int
+        :return: dividends as returned by the API
+        :rtype: List[Dict]
+        """
+        dividends = []
+        while start_time < end_time:
             # the stable working version of client.get_asset_dividend_history is not released yet,
             # for now it has a post error, so this protected member is used in the meantime
             params = {
                 'startTime': start_time,
-                'endTime': start_time + delta_jump,
+                'endTime': end_time,
                 'limit': limit
             }
             client_params = {
@@ -908,29 +1212,17 @@ class BinanceManager:
                 'signed': True,
                 'data': params
             }
-            result = self._call_binance_client('_request_margin_api', client_params)
-
-            dividends = result['rows']
-            for div in dividends:
-                self.db.add_dividend(div_id=int(div['tranId']),
-                                     div_time=int(div['divTime']),
-                                     asset=div['asset'],
-                                     amount=float(div['amount']),
-                                     auto_commit=False
-                                     )
-            pbar.update()
-            if len(dividends) < limit:
-                start_time += delta_jump + 1  # endTime is included in the previous return, so we have to add 1
-            else:  # limit was reached before the end of the time windows
-                start_time = int(dividends[0]['divTime']) + 1
-            if len(dividends):
-                self.db.commit()
-        pbar.close()
+            rows = self._call_binance_client('_request_margin_api', client_params)['rows']
+            dividends.extend(rows)
+            if len(rows) < limit:
+                break
+            start_time = int(rows[0]['divTime']) + 1  # limit was reached before the end of the time window
+        return dividends
 
     def update_spot_withdraws(self, day_jump: float = 90):
         """
         This fetch the crypto withdraws made on the spot account from the last withdraw time in the database to now.
-        It is done with multiple call, each having a time window of day_jump days.
+        It is done with multiple call, each having a time window of day_jump days, made concurrently.
         The withdraws are then saved in the database.
         Only successful withdraws are fetched.
 
@@ -943,39 +1235,29 @@ class BinanceManager:
         :return: None
         :rtype: None
         """
-        delta_jump = min(day_jump, 90) * 24 * 3600 * 1000
+        delta_jump = int(min(day_jump, 90) * 24 * 3600 * 1000)
+        if self._is_recently_synced('spot_withdraws'):
+            return
         start_time = self.db.get_last_spot_withdraw_time() + 1
-        now_millistamp = datetime_to_millistamp(datetime.datetime.now(tz=datetime.timezone.utc))
-        pbar = tqdm(total=math.ceil((now_millistamp - start_time) / delta_jump))
-        pbar.set_description("fetching spot withdraws")
-        while start_time < now_millistamp:
-            client_params = {
-                'startTime': start_time,
-                'endTime': start_time + delta_jump,
-                'status': 6
-            }
-            result = self._call_binance_client('get_withdraw_history', client_params)
-
-            withdraws = result['withdrawList']
-            for withdraw in withdraws:
-                self.db.add_withdraw(withdraw_id=withdraw['id'],
-                                     tx_id=withdraw['txId'],
-                                     apply_time=int(withdraw['applyTime']),
-                                     asset=withdraw['asset'],
-                                     amount=float(withdraw['amount']),
-                                     fee=float(withdraw['transactionFee']),
-                                     auto_commit=False
-                                     )
-            pbar.update()
-            start_time += delta_jump + 1  # endTime is included in the previous return, so we have to add 1
-            if len(withdraws):
-                self.db.commit()
-        pbar.close()
+        now_millistamp = int(1000 * time.time())
+        windows = self._get_time_windows(start_time, now_millistamp, delta_jump)
+        fetch_params = [{'method_name': 'get_withdraw_history',
+                         'params': {'startTime': window_start, 'endTime': window_end, 'status': 6}}
+                        for window_start, window_end in windows]
+        with self._progress_bar(len(fetch_params)) as pbar, self.db.transaction():
+            pbar.set_description("fetching spot withdraws", refresh=False)
+            for _, result in self._fetch_concurrently(self._call_binance_client, fetch_params):
+                withdraws = result['withdrawList']
+                rows = [(withdraw['id'], withdraw['txId'], int(withdraw['applyTime']), withdraw['asset'],
+                         float(withdraw['amount']), float(withdraw['transactionFee'])) for withdraw in withdraws]
+                self.db.add_withdraws(rows, auto_commit=False)
+                pbar.update()
+            self.db.set_sync_time('spot_withdraws', now_millistamp, auto_commit=False)
 
     def update_spot_deposits(self, day_jump: float = 90):
         """
         This fetch the crypto deposit made on the spot account from the last deposit time in the database to now.
-        It is done with multiple call, each having a time window of day_jump days.
+        It is done with multiple call, each having a time window of day_jump days, made concurrently.
         The deposits are then saved in the database.
         Only successful deposits are fetched.
 
@@ -988,31 +1270,24 @@ class BinanceManager:
         :return: None
         :rtype: None
         """
-        delta_jump = min(day_jump, 90) * 24 * 3600 * 1000
+        delta_jump = int(min(day_jump, 90) * 24 * 3600 * 1000)
+        if self._is_recently_synced('spot_deposits'):
+            return
         start_time = self.db.get_last_spot_deposit_time() + 1
-        now_millistamp = datetime_to_millistamp(datetime.datetime.now(tz=datetime.timezone.utc))
-        pbar = tqdm(total=math.ceil((now_millistamp - start_time) / delta_jump))
-        pbar.set_description("fetching spot deposits")
-        while start_time < now_millistamp:
-            client_params = {
-                'startTime': start_time,
-                'endTime': start_time + delta_jump,
-                'status': 1
-            }
-            result = self._call_binance_client('get_deposit_history', client_params)
-
-            deposits = result['depositList']
-            for deposit in deposits:
-                self.db.add_deposit(tx_id=deposit['txId'],
-                                    asset=deposit['asset'],
-                                    insert_time=int(deposit['insertTime']),
-                                    amount=float(deposit['amount']),
-                                    auto_commit=False)
-            pbar.update()
-            start_time += delta_jump + 1  # endTime is included in the previous return, so we have to add 1
-            if len(deposits):
-                self.db.commit()
-        pbar.close()
+        now_millistamp = int(1000 * time.time())
+        windows = self._get_time_windows(start_time, now_millistamp, delta_jump)
+        fetch_params = [{'method_name': 'get_deposit_history',
+                         'params': {'startTime': window_start, 'endTime': window_end, 'status': 1}}
+                        for window_start, window_end in windows]
+        with self._progress_bar(len(fetch_params)) as pbar, self.db.transaction():
+            pbar.set_description("fetching spot deposits", refresh=False)
+            for _, result in self._fetch_concurrently(self._call_binance_client, fetch_params):
+                deposits = result['depositList']
+                rows = [(deposit['txId'], int(deposit['insertTime']), float(deposit['amount']), deposit['asset'])
+                        for deposit in deposits]
+                self.db.add_deposits(rows, auto_commit=False)
+                pbar.update()
+            self.db.set_sync_time('spot_deposits', now_millistamp, auto_commit=False)
 
     def update_spot_symbol_trades(self, asset: str, ref_asset: str, limit: int = 1000):
         """
@@ -1032,86 +1307,504 @@ class BinanceManager:
         :return: None
         :rtype: None
         """
-        limit = min(1000, limit)
+        limit = max(1, min(1000, limit))
         symbol = asset + ref_asset
+        sync_key = f"spot_trades_{symbol}"
+        if self._is_recently_synced(sync_key):
+            return
+        sync_time = int(1000 * time.time())
         last_trade_id = self.db.get_max_trade_id(asset, ref_asset, 'spot')
-        while True:
-            client_params = {
-                'symbol': symbol,
-                'fromId': last_trade_id + 1,
-                'limit': limit
-            }
-            new_trades = self._call_binance_client('get_my_trades', client_params)
-
-            for trade in new_trades:
-                self.db.add_trade(trade_type='spot',
-                                  trade_id=int(trade['id']),
-                                  trade_time=int(trade['time']),
-                                  asset=asset,
-                                  ref_asset=ref_asset,
-                                  qty=float(trade['qty']),
-                                  price=float(trade['price']),
-                                  fee=float(trade['commission']),
-                                  fee_asset=trade['commissionAsset'],
-                                  is_buyer=trade['isBuyer'],
-                                  auto_commit=False
-                                  )
-                last_trade_id = max(last_trade_id, int(trade['id']))
-            if len(new_trades):
-                self.db.commit()
-            if len(new_trades) < limit:
-                break
+        trades = self._fetch_spot_symbol_trades(symbol=symbol, last_trade_id=last_trade_id, limit=limit)
+        with self.db.transaction():
+            rows = self._parse_trades(trades, asset=asset, ref_asset=ref_asset)
+            self.db.add_trades('spot', rows, auto_commit=False)
+            self.db.set_sync_time(sync_key, sync_time, auto_commit=False)
 
-    def update_all_spot_trades(self, limit: int = 1000):
+    def _fetch_spot_symbol_trades(self, symbol: str, last_trade_id: int, limit: int = 1000) -> List[Dict]:
         """
-        This update the spot trades in the database for every trading pairs
+        fetch from the API the spot trades of a trading pair made after a given trade id. This method does not use
+        the database, so it can be called from several threads at once.
 
+        :param symbol: trading pair (ex 'BTCUSDT')
+        :type symbol: str
+        :param last_trade_id: id of the latest trade already saved
+        :type last_trade_id: int
         :param limit: max size of each trade requests
         :type limit: int
+        :return: trades as returned by the API
+        :rtype: List[Dict]
+        """
+        client_params = {
+            'symbol': symbol,
+            'limit': max(1, min(1000, limit))
+        }
+        return self._fetch_from_id('get_my_trades', client_params, last_trade_id)
+
+    def update_all_spot_trades(self, limit: int = 1000, full: bool = False):
+        """
+        This update the spot trades in the database for the trading pairs the account may have traded. The trading
+        pairs are fetched concurrently and saved as they complete.
+
+        :param limit: max size of each trade requests
+        :type limit: int
+        :param full: if False, only the trading pairs currently trading and involving an asset of the account
+            (see get_spot_assets) are updated. If True, every trading pair is updated, including the delisted ones:
+            use it for the first update of an account.
+        :type full: bool
         :return: None
         :rtype: None
         """
-        symbols_info = self.client.get_exchange_info()['symbols']
-        pbar = tqdm(total=len(symbols_info))
+        symbols_info = self.get_spot_symbols_info()
+        if not full:
+            assets = self.get_spot_assets()
+            symbols_info = [symbol_info for symbol_info in symbols_info
+                            if symbol_info['status'] == 'TRADING'
+                            and (symbol_info['baseAsset'] in assets or symbol_info['quoteAsset'] in assets)]
+        sync_keys = {symbol_info['symbol']: f"spot_trades_{symbol_info['symbol']}" for symbol_info in symbols_info}
+        symbols_info = [symbol_info for symbol_info in symbols_info
+                        if not self._is_recently_synced(sync_keys[symbol_info['symbol']])]
+        sync_time = int(1000 * time.time())
+
+        fetch_params = []
         for symbol_info in symbols_info:
-            pbar.set_description(f"fetching {symbol_info['symbol']} spot trades")
-            self.update_spot_symbol_trades(asset=symbol_info['baseAsset'],
-                                           ref_asset=symbol_info['quoteAsset'],
-                                           limit=limit)
-            pbar.update()
-        pbar.close()
-
-    def _call_binance_client(self, method_name: str, params: Optional[Dict] = None,
-                             retry_count: int = 0) -> Union[Dict, List]:
+            last_trade_id = self.db.get_max_trade_id(symbol_info['baseAsset'], symbol_info['quoteAsset'], 'spot')
+            fetch_params.append({'symbol': symbol_info['symbol'],
+                                 'last_trade_id': last_trade_id,
+                                 'limit': limit})
+        symbols_assets = {symbol_info['symbol']: (symbol_info['baseAsset'], symbol_info['quoteAsset'])
+                          for symbol_info in symbols_info}
+
+        uncommitted_rows = 0
+        with self._progress_bar(len(symbols_info)) as pbar, self.db.transaction():
+            for params, trades in self._fetch_concurrently(self._fetch_spot_symbol_trades, fetch_params):
+                pbar.set_description(f"fetched {params['symbol']} spot trades", refresh=False)
+                asset, ref_asset = symbols_assets[params['symbol']]
+                rows = self._parse_trades(trades, asset=asset, ref_asset=ref_asset)
+                self.db.add_trades('spot', rows, auto_commit=False)
+                self.db.set_sync_time(sync_keys[params['symbol']], sync_time, auto_commit=False)
+                uncommitted_rows += len(rows)
+                if uncommitted_rows >= BinanceManager.COMMIT_ROWS_INTERVAL:  # bound the work lost on a failure
+                    self.db.checkpoint()
+                    uncommitted_rows = 0
+                pbar.update()
+
+    def _call_binance_client(self, method_name: str, params: Optional[Dict] = None) -> Union[Dict, List]:
         """
-        This method is used to handle rate limits: if a rate limits is breached, it will wait the necessary time
-        to call again the API.
+        This method is used to handle rate limits: calls wait for the rate limiter until their weight
+        (API_METHOD_WEIGHTS) is available, and the limiter follows the weight used as reported by the API.
+        If a rate limits is still breached, it will wait the necessary time to call again the API, up to
+        API_MAX_RETRY attempts.
 
         :param method_name: name of the method binance.Client to call
         :type method_name: str
         :param params: parameters to pass to the above method
         :type params: Dict
-        :param retry_count: internal use only to count the number of retry if rate limits are breached
-        :type retry_count: int
         :return: response of binance.Client method
         :rtype: Union[Dict, List]
         """
         if params is None:
             params = dict()
-        if retry_count >= BinanceManager.API_MAX_RETRY:
-            raise RuntimeError(f"The API rate limits has been breached {retry_count} times")
-
-        try:
-            return getattr(self.client, method_name)(**params)
-        except BinanceAPIException as err:
-            if err.code == -1003:  # API rate Limits
-                # wait_time = float(err.response.headers['Retry-After']) it seems to be always 0, so unusable
-                wait_time = 1 + 60 - datetime.datetime.now().timestamp() % 60  # number of seconds until next minute
+        client_method = self._client_methods.get(method_name)
+        if client_method is None:
+            if method_name not in BinanceManager.CLIENT_METHODS:
+                raise ValueError(f"method_name should be one of {BinanceManager.CLIENT_METHODS} but {method_name} was"
+                                 f" received")
+            raise AttributeError(f"the installed binance.Client has no method {method_name}")
+        client = self._get_thread_client()
+        for _ in range(BinanceManager.API_MAX_RETRY):
+            self.rate_limiter.acquire(BinanceManager.API_METHOD_WEIGHTS.get(method_name, 1))
+            try:
+                response = client_method(client, **params)
+            except BinanceAPIException as err:
+                if err.code != -1003 and err.status_code not in (418, 429):  # API rate Limits
+                    raise err
+                self.rate_limiter.sync(self.rate_limiter.capacity)  # slow down the other threads as well
+                wait_time = float(err.response.headers.get('Retry-After', 0))
+                if wait_time <= 0:  # the header is often 0, wait until the next minute instead
+                    wait_time = 1 + 60 - time.time() % 60
                 if err.response.status_code == 418:  # ban
                     self.logger.error(f"API calls resulted in a ban, retry in {wait_time} seconds")
                     raise err
                 self.logger.info(f"API calls resulted in a breach of rate limits,"
                                  f" will retry after {wait_time:.2f} seconds")
                 time.sleep(wait_time)
-                return self._call_binance_client(method_name, params, retry_count + 1)
-            raise err
+                continue
+
+            used_weight = client.response.headers.get('x-mbx-used-weight-1m')
+            if used_weight is not None:
+                self.rate_limiter.sync(float(used_weight))
+            return response
+        raise RuntimeError(f"The API rate limits has been breached {BinanceManager.API_MAX_RETRY} times")
+
+    def _is_recently_synced(self, sync_key: str) -> bool:
+        """
+        Tell if a data stream was updated less than min_sync_interval seconds ago, in which case it does not need
+        to be fetched again
+
+        :param sync_key: identifier of the data stream in the database
+        :type sync_key: str
+        :return: if the update of the data stream can be skipped
+        :rtype: bool
+        """
+        if self.min_sync_interval <= 0:
+            return False
+        sync_time = self.db.get_sync_time(sync_key)
+        return sync_time is not None and 1000 * time.time() - sync_time < 1000 * self.min_sync_interval
+
+    def _is_archive_synced(self, sync_key: str) -> bool:
+        """
+        Tell if the archived margin data of a stream are already in the database. Binance archives the margin
+        records after three months: if the stream was successfully updated less than three months ago, all the
+        archived records were fetched then and the archived pages can be skipped.
+
+        :param sync_key: identifier of the data stream in the database
+        :type sync_key: str
+        :return: if the archived data of the stream do not need to be fetched
+        :rtype: bool
+        """
+        sync_time = self.db.get_sync_time(sync_key)
+        return sync_time is not None and not self._is_archived_window(sync_time, int(1000 * time.time()))
+
+    @staticmethod
+    def _is_archived_window(start_time: int, now_millistamp: int) -> bool:
+        """
+        Tell if the margin records made after a given time may be archived by Binance, which happens to the records
+        older than three months
+
+        :param start_time: millistamp of the beginning of the window
+        :type start_time: int
+        :param now_millistamp: current millistamp
+        :type now_millistamp: int
+        :return: if the window starts before the records are archived
+        :rtype: bool
+        """
+        return now_millistamp - start_time > BinanceManager._THREE_MONTHS_MS
+
+    def _get_isolated_symbols(self, symbols_info: Optional[List[Dict]] = None) -> List[Tuple[str, str, str]]:
+        """
+        Return the isolated symbols to update with their assets, each symbol only once
+
+        :param symbols_info: details on the symbols, each dictionary needs the fields 'asset' and 'ref_asset'.
+            If not provided, the isolated symbols funded by a transfer saved in the database are returned, except the
+            ones that the API reported as never used during the last UNUSED_ISOLATED_SYMBOL_TTL seconds.
+        :type symbols_info: Optional[List[Dict]]
+        :return: list of (symbol, asset, ref_asset)
+        :rtype: List[Tuple[str, str, str]]
+        """
+        skip_unused = symbols_info is None
+        if symbols_info is None:
+            symbols_info = self._get_funded_isolated_symbols_info()
+        symbols = {}
+        for symbol_info in symbols_info:
+            asset = symbol_info['asset']
+            ref_asset = symbol_info['ref_asset']
+            symbol = symbol_info.get('symbol') or asset + ref_asset
+            symbols[symbol] = (symbol, asset, ref_asset)
+        if skip_unused:
+            min_time = 1000 * (time.time() - BinanceManager.UNUSED_ISOLATED_SYMBOL_TTL)
+            unused_times = {symbol: self.db.get_sync_time(self._get_unused_symbol_key(symbol)) for symbol in symbols}
+            symbols = {symbol: symbol_assets for symbol, symbol_assets in symbols.items()
+                       if unused_times[symbol] is None or unused_times[symbol] < min_time}
+        return list(symbols.values())
+
+    def _get_funded_isolated_symbols_info(self) -> List[Dict]:
+        """
+        Return the details of the isolated symbols that received at least one transfer saved in the database. The
+        other isolated symbols can not have trades, loans, repays or interests.
+
+        :return: details on the symbols, each symbol only once
+        :rtype: List[Dict]
+
+        .. code-block:: python
+
+            [
+                {
+                    'asset': 'BTC',
+                    'ref_asset': 'USDT',
+                    'symbol': 'BTCUSDT'
+                },
+                ...
+            ]
+        """
+        symbols_info = {}
+        for symbol, token in self.db.get_isolated_transfer_symbols():
+            if symbol in symbols_info:
+                continue
+            if symbol.startswith(token):
+                asset, ref_asset = token, symbol[len(token):]
+            else:
+                asset, ref_asset = symbol[:-len(token)], token
+            symbols_info[symbol] = {'asset': asset, 'ref_asset': ref_asset, 'symbol': symbol}
+        return list(symbols_info.values())
+
+    @staticmethod
+    def _get_unused_symbol_key(isolated_symbol: str) -> str:
+        """
+        Return the identifier in the sync state table of the time when an isolated symbol was reported by the API as
+        never used
+
+        :param isolated_symbol: isolated margin symbol
+        :type isolated_symbol: str
+        :return: sync key (ex: 'isolated_margin_unused_BTCUSDT')
+        :rtype: str
+        """
+        return f"isolated_margin_unused_{isolated_symbol}"
+
+    @staticmethod
+    def _get_margin_sync_key(data_type: str, asset: Optional[str] = None, isolated_symbol: Optional[str] = None) -> str:
+        """
+        Return the identifier of the margin data of an asset in the sync state table
+
+        :param data_type: type of the margin data (ex: 'loans', 'repays', 'interests')
+        :type data_type: str
+        :param asset: asset of the data, None for the data fetched for all the assets at once (ex: 'interests')
+        :type asset: Optional[str]
+        :param isolated_symbol: only for isolated margin, the trading symbol of the data
+        :type isolated_symbol: Optional[str]
+        :return: sync key (ex: 'cross_margin_repays_BTC' or 'isolated_margin_loans_BTCUSDT_USDT')
+        :rtype: str
+        """
+        if isolated_symbol is None:
+            sync_key = f"cross_margin_{data_type}"
+        else:
+            sync_key = f"isolated_margin_{data_type}_{isolated_symbol}"
+        if asset is not None:
+            sync_key += f"_{asset}"
+        return sync_key
+
+    @staticmethod
+    def _parse_trades(trades: List[Dict], asset: str, ref_asset: str) -> List[Tuple]:
+        """
+        Convert trades returned by the API (spot or margin) to rows for BinanceDataBase.add_trades
+
+        :param trades: trades as returned by the API
+        :type trades: List[Dict]
+        :param asset: name of the asset in the trading pair (ex 'BTC' for 'BTCUSDT')
+        :type asset: string
+        :param ref_asset: name of the reference asset in the trading pair (ex 'USDT' for 'BTCUSDT')
+        :type ref_asset: string
+        :return: rows as (trade_id, trade_time, asset, ref_asset, qty, price, fee, fee_asset, is_buyer)
+        :rtype: List[Tuple]
+        """
+        return [(int(trade_id), int(trade_time), asset, ref_asset, float(qty), float(price), float(fee), fee_asset,
+                 is_buyer)
+                for trade_id, trade_time, qty, price, fee, fee_asset, is_buyer
+                in map(BinanceManager._TRADE_FIELDS, trades)]
+
+    def _mount_http_adapter(self):
+        """
+        Mount on the session of the client a connection pool large enough to keep a connection alive for each worker
+        thread, so that the TLS handshake is not paid again between the pages of a sweep. Requests failing on a
+        connection error are retried with a backoff, and responses are requested compressed.
+
+        :return: None
+        :rtype: None
+        """
+        adapter = HTTPAdapter(pool_connections=8,
+                              pool_maxsize=max(32, self.max_workers),
+                              max_retries=Retry(total=BinanceManager.HTTP_MAX_RETRY, backoff_factor=0.3))
+        self.client.session.mount('https://', adapter)
+        # requests already sends these headers by default, they are set explicitly as the update relies on them
+        self.client.session.headers.update({'Connection': 'keep-alive', 'Accept-Encoding': 'gzip, deflate'})
+
+    @staticmethod
+    def _orjson_response_hook(response: requests.Response, *args, **kwargs) -> requests.Response:
+        """
+        Response hook of the client session making the response decode its json content with orjson, which is
+        several times faster than the standard json module on the large pages returned by the API.
+        orjson.JSONDecodeError is a ValueError, so binance.Client handles invalid responses as before.
+
+        :param response: response received by the session
+        :type response: requests.Response
+        :return: the same response
+        :rtype: requests.Response
+        """
+        response.json = lambda **_: orjson.loads(response.content)
+        return response
+
+    def _get_thread_client(self) -> Client:
+        """
+        Return the client to use in the current thread. binance.Client stores the last response on itself before
+        parsing it, so a client can not be shared between threads: each worker thread gets a shallow copy, which
+        keeps the same session and keys.
+
+        :return: client of the current thread
+        :rtype: Client
+        """
+        client = getattr(self._thread_data, 'client', None)
+        if client is None:
+            client = copy.copy(self.client)
+            self._thread_data.client = client
+        return client
+
+    @staticmethod
+    @contextmanager
+    def _progress_bar(total: int, pbar: Optional[tqdm] = None) -> Iterator[tqdm]:
+        """
+        Provide a progress bar for the steps of an update. If a progress bar shared by several updates is given, the
+        steps are added to its total and it is left open, otherwise a new progress bar is displayed and closed at the
+        end of the context.
+
+        :param total: number of steps of the update
+        :type total: int
+        :param pbar: progress bar shared with other updates
+        :type pbar: Optional[tqdm]
+        :return: progress bar to update after each step
+        :rtype: Iterator[tqdm]
+        """
+        if pbar is not None:
+            pbar.total += total
+            yield pbar
+            return
+        pbar = tqdm(total=total)
+        try:
+            yield pbar
+        finally:
+            pbar.close()
+
+    @staticmethod
+    def _get_time_windows(start_time: int, end_time: int, delta_jump: int) -> List[Tuple[int, int]]:
+        """
+        Split a period in successive time windows of the endpoints taking 'startTime' and 'endTime'. The end of a
+        window is included in the responses, so the next window starts one millisecond later.
+
+        :param start_time: millistamp of the beginning of the period
+        :type start_time: int
+        :param end_time: millistamp of the end of the period
+        :type end_time: int
+        :param delta_jump: length of a window in milliseconds
+        :type delta_jump: int
+        :return: start and end millistamps of each window
+        :rtype: List[Tuple[int, int]]
+        """
+        return [(window_start, window_start + delta_jump)
+                for window_start in range(start_time, end_time, delta_jump + 1)]
+
+    def _fetch_concurrently(self, fetch_method: Callable, params_list: List[Dict]) -> Iterator[Tuple[Dict, Any]]:
+        """
+        Call a fetch method with each set of parameters in a pool of threads and yield the results as they
+        complete. The fetch method must not use the database: the sqlite connection belongs to the calling thread,
+        which is in charge of saving the yielded results.
+
+        :param fetch_method: method doing only API calls
+        :type fetch_method: Callable
+        :param params_list: keyword arguments for each call of the fetch method
+        :type params_list: List[Dict]
+        :return: couples of the parameters of a call and of its result
+        :rtype: Iterator[Tuple[Dict, Any]]
+        """
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            futures = {executor.submit(fetch_method, **params): params for params in params_list}
+            try:
+                for future in as_completed(futures):
+                    yield futures[future], future.result()
+            finally:
+                for future in futures:  # on error, don't wait for the calls not started yet
+                    future.cancel()
+
+    def _fetch_from_id(self, method_name: str, params: Dict, last_id: int) -> List[Dict]:
+        """
+        Fetch all the rows of an endpoint paginated with 'fromId' after a given id. The rows are returned by
+        ascending id, so the cursor of the next call is read on the last row of each response, until a response
+        is not full.
+
+        :param method_name: name of the method binance.Client to call
+        :type method_name: str
+        :param params: parameters to pass to the above method, 'limit' included and 'fromId' excluded
+        :type params: Dict
+        :param last_id: id of the latest row already saved
+        :type last_id: int
+        :return: rows as returned by the API
+        :rtype: List[Dict]
+        """
+        rows = []
+        while True:
+            new_rows = self._call_binance_client(method_name, {**params, 'fromId': last_id + 1})
+            rows.extend(new_rows)
+            if len(new_rows) < params['limit']:
+                return rows
+            last_id = int(new_rows[-1]['id'])
+
+    def _paginate(self, method_name: str, params: Dict, time_key: Optional[str] = None,
+                  request_params: Optional[Dict] = None) -> Iterator[Dict]:
+        """
+        Fetch one after the other the pages of an endpoint paginated with 'current' and 'size', whose responses hold
+        their rows under 'rows', and yield the rows one at a time. Unlike _fetch_pages, no thread is started, so this
+        can run in the workers of _fetch_concurrently.
+        If 'archived' is True in the parameters, the archived pages are fetched first, then the current pages from one
+        second after the latest archived row.
+
+        :param method_name: name of the method binance.Client to call
+        :type method_name: str
+        :param params: parameters of the endpoint, 'size' and 'startTime' included and 'current' excluded
+        :type params: Dict
+        :param time_key: key of the millistamp of the rows, needed to switch from the archived to the current pages
+        :type time_key: Optional[str]
+        :param request_params: if provided, parameters of the method, which then receives the endpoint parameters
+            under 'data' (ex: for _request_margin_api)
+        :type request_params: Optional[Dict]
+        :return: rows of the endpoint
+        :rtype: Iterator[Dict]
+        """
+        params = {**params, 'current': 1}
+        latest_time = params['startTime'] - 1000
+        while True:
+            # the client adds the signature to the parameters it receives, so each call gets its own copy
+            if request_params is None:
+                response = self._call_binance_client(method_name, dict(params))
+            else:
+                response = self._call_binance_client(method_name, {**request_params, 'data': dict(params)})
+            rows = response.get('rows', [])
+            for row in rows:
+                if time_key is not None:
+                    latest_time = max(latest_time, row[time_key])
+                yield row
+
+            if len(rows) == params['size']:
+                params['current'] += 1  # next page
+            elif params.get('archived', False):  # switching to non archived rows
+                params['current'] = 1
+                params['archived'] = False
+                params['startTime'] = latest_time + 1000
+            else:
+                return
+
+    def _fetch_pages(self, method_name: str, params: Dict, rows_key: Optional[str] = None) -> Iterator[List]:
+        """
+        Fetch the successive pages of an endpoint paginated with 'current' and 'size' and yield their rows in order,
+        until a page is not full. The first page is fetched alone, then windows of pages are requested concurrently,
+        the window doubling each time up to max_workers pages. The next window is requested before the rows of the
+        current one are yielded, so that it is fetched while the caller saves them.
+
+        :param method_name: name of the method binance.Client to call
+        :type method_name: str
+        :param params: parameters to pass to the above method, 'size' included and 'current' excluded
+        :type params: Dict
+        :param rows_key: key of the rows in the response, if the response is not directly the list of rows.
+            A missing key means that there are no rows.
+        :type rows_key: Optional[str]
+        :return: rows of each page
+        :rtype: Iterator[List]
+        """
+        current = 1
+        window = 1
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            futures = [executor.submit(self._call_binance_client, method_name, {**params, 'current': current})]
+            try:
+                while futures:
+                    pages = [future.result() for future in futures]
+                    if rows_key is not None:
+                        pages = [page.get(rows_key, []) for page in pages]
+                    current += window
+                    futures = []
+                    if all(len(rows) == params['size'] for rows in pages):
+                        window = min(2 * window, self.max_workers)
+                        futures = [executor.submit(self._call_binance_client, method_name, {**params, 'current': page})
+                                   for page in range(current, current + window)]
+                    for rows in pages:
+                        yield rows
+                        if len(rows) < params['size']:
+                            return
+            finally:
+                for future in futures:  # on error or early stop, don't wait for the calls not started yet
+                    future.cancel()
@@ -1,5 +1,5 @@
 import datetime
-from typing import Optional
+from typing import Optional, List, Tuple, Set, Any
 
 from BinanceWatch.storage.DataBase import DataBase, SQLConditionEnum
 from BinanceWatch.storage import tables
@@ -11,15 +11,72 @@ class BinanceDataBase(DataBase):
     Handles the recording of the binance account in a local database
     """
 
-    def __init__(self, name: str = 'binance_db'):
+    SYNCHRONOUS_MODES = ('OFF', 'NORMAL', 'FULL', 'EXTRA')
+    DEFAULT_START_TIME = datetime_to_millistamp(datetime.datetime(2017, 1, 1, tzinfo=datetime.timezone.utc))
+
+    def __init__(self, name: str = 'binance_db', synchronous: str = 'NORMAL'):
         """
         Initialise a binance database instance
 
         :param name: name of the database
         :type name: str
-        """
+        :param synchronous: sqlite synchronous mode, one of ('OFF', 'NORMAL', 'FULL', 'EXTRA'). 'NORMAL' is safe
+            against corruption in WAL mode, 'OFF' is faster but the last commits may be lost on a power failure
+        :type synchronous: str
+        """
+        synchronous = synchronous.upper()
+        if synchronous not in self.SYNCHRONOUS_MODES:
+            raise ValueError(f"synchronous should be one of {self.SYNCHRONOUS_MODES} but {synchronous} was received")
+        self.synchronous = synchronous
         super().__init__(name)
 
+    def connect(self):
+        """
+        Connect to the sqlite3 database and tune it for the append-heavy workload of the updates:
+        write-ahead logging checkpointed less often, configurable synchronous mode, a larger page cache,
+        memory-mapped reads and a longer wait when another process holds the write lock.
+        The indexes missing from the existing tables, for example in a database created by an older version, are
+        also created
+
+        :return: None
+        :rtype: None
+        """
+        super().connect()
+        self.db_conn.executescript(f"PRAGMA journal_mode=WAL;"
+                                   f"PRAGMA synchronous={self.synchronous};"
+                                   f"PRAGMA wal_autocheckpoint=10000;"  # pages, 40 MB with the default page size
+                                   f"PRAGMA temp_store=MEMORY;"
+                                   f"PRAGMA cache_size=-65536;"  # 64 MB
+                                   f"PRAGMA mmap_size=268435456;"  # 256 MB
+                                   f"PRAGMA busy_timeout=30000;")  # ms
+        existing_tables = {table_desc[1] for table_desc in self.get_all_tables()}
+        for table in vars(tables).values():
+            if isinstance(table, tables.Table) and table.indexes and table.name in existing_tables:
+                self.create_indexes(table)
+
+    def _get_history_rows(self, table: tables.Table, time_column: str,
+                          conditions_list: List[Tuple[str, SQLConditionEnum, Any]],
+                          limit: Optional[int] = None) -> List[Tuple]:
+        """
+        Select the rows of a history table. If a limit is provided, only the latest rows are selected, sorted from
+        the most recent to the oldest
+
+        :param table: history table to select the rows from
+        :type table: Table
+        :param time_column: time column of the table
+        :type time_column: str
+        :param conditions_list: list of conditions to select the rows
+        :type conditions_list: List[Tuple[str, SQLConditionEnum, Any]]
+        :param limit: maximum number of rows to return, default no limit and no ordering
+        :type limit: Optional[int]
+        :return: the selected rows
+        :rtype: List[Tuple]
+        """
+        if limit is None:
+            return self.get_conditions_rows(table, conditions_list=conditions_list)
+        return self.get_conditions_rows(table, conditions_list=conditions_list, order_list=[time_column],
+                                        descending=True, limit=limit)
+
     def add_universal_transfer(self, transfer_id: int, transfer_type: str, transfer_time: int, asset: str,
                                amount: float, auto_commit: bool = True):
         """
@@ -40,13 +97,27 @@ class BinanceDataBase(DataBase):
         :return: None
         :rtype: None
         """
-        table = tables.UNIVERSAL_TRANSFER_TABLE
+        self.add_universal_transfers([(transfer_id, transfer_type, transfer_time, asset, amount)],
+                                     auto_commit=auto_commit)
 
-        row = (transfer_id, transfer_type, transfer_time, asset, amount)
-        self.add_row(table, row, auto_commit=auto_commit)
+    def add_universal_transfers(self, transfers: List[Tuple], auto_commit: bool = True):
+        """
+        Add several universal transfers to the database in a single statement.
+        The rows whose primary key is already saved are skipped
+
+        :param transfers: transfers to add, each one as (transfer_id, transfer_type, transfer_time, asset, amount)
+            (see add_universal_transfer)
+        :type transfers: List[Tuple]
+        :param auto_commit: if the database should commit the change made, default True
+        :type auto_commit: bool
+        :return: None
+        :rtype: None
+        """
+        self.add_rows(tables.UNIVERSAL_TRANSFER_TABLE, transfers, auto_commit=auto_commit, ignore_if_exists=True)
 
     def get_universal_transfers(self, transfer_type: Optional[str] = None, asset: Optional[str] = None,
-                                start_time: Optional[int] = None, end_time: Optional[int] = None):
+                                start_time: Optional[int] = None, end_time: Optional[int] = None,
+                                limit: Optional[int] = None):
         """
         Return universal transfers stored in the database. Transfer type, Asset type and time filters can be used
 
@@ -58,6 +129,8 @@ class BinanceDataBase(DataBase):
         :type start_time: Optional[int]
         :param end_time: fetch only interests before this millistamp
         :type end_time: Optional[int]
+        :param limit: fetch only this number of the latest rows, sorted from the most recent to the oldest
+        :type limit: Optional[int]
         :return: The raw rows selected as saved in the database
         :rtype: List[Tuple]
 
@@ -90,7 +163,7 @@ class BinanceDataBase(DataBase):
             conditions_list.append((table.trfTime,
                                     SQLConditionEnum.lower,
                                     end_time))
-        return self.get_conditions_rows(table, conditions_list=conditions_list)
+        return self._get_history_rows(table, table.trfTime, conditions_list, limit)
 
     def get_last_universal_transfer_time(self, transfer_type: str) -> int:
         """
@@ -106,18 +179,8 @@ class BinanceDataBase(DataBase):
         conditions_list = [(table.trfType,
                             SQLConditionEnum.equal,
                             transfer_type)]
-        selection = f"MAX({table.trfTime})"
-        result = self.get_conditions_rows(table,
-                                          selection=selection,
-                                          conditions_list=conditions_list)
-        default = datetime_to_millistamp(datetime.datetime(2017, 1, 1, tzinfo=datetime.timezone.utc))
-        try:
-            result = result[0][0]
-        except IndexError:
-            return default
-        if result is None:
-            return default
-        return result
+        return self.fetch_scalar(table, f"MAX({table.trfTime})", conditions_list=conditions_list,
+                                 default=BinanceDataBase.DEFAULT_START_TIME)
 
     def add_isolated_transfer(self, transfer_id: int, transfer_type: str, transfer_time: int, isolated_symbol: str,
                               asset: str, amount: float, auto_commit: bool = True):
@@ -141,13 +204,26 @@ class BinanceDataBase(DataBase):
         :return: None
         :rtype: None
         """
-        table = tables.ISOLATED_MARGIN_TRANSFER_TABLE
+        self.add_isolated_transfers([(transfer_id, transfer_type, transfer_time, isolated_symbol, asset, amount)],
+                                    auto_commit=auto_commit)
 
-        row = (transfer_id, transfer_type, transfer_time, isolated_symbol, asset, amount)
-        self.add_row(table, row, auto_commit=auto_commit)
+    def add_isolated_transfers(self, transfers: List[Tuple], auto_commit: bool = True):
+        """
+        Add several isolated transfers to the database in a single statement.
+        The rows whose primary key is already saved are skipped
+
+        :param transfers: transfers to add, each one as
+            (transfer_id, transfer_type, transfer_time, isolated_symbol, asset, amount) (see add_isolated_transfer)
+        :type transfers: List[Tuple]
+        :param auto_commit: if the database should commit the change made, default True
+        :type auto_commit: bool
+        :return: None
+        :rtype: None
+        """
+        self.add_rows(tables.ISOLATED_MARGIN_TRANSFER_TABLE, transfers, auto_commit=auto_commit, ignore_if_exists=True)
 
     def get_isolated_transfers(self, isolated_symbol: Optional[str] = None, start_time: Optional[int] = None,
-                               end_time: Optional[int] = None):
+                               end_time: Optional[int] = None, limit: Optional[int] = None):
         """
         Return isolated transfers stored in the database. isolated_symbol and time filters can be used
 
@@ -158,6 +234,8 @@ class BinanceDataBase(DataBase):
         :type start_time: Optional[int]
         :param end_time: fetch only transfers before this millistamp
         :type end_time: Optional[int]
+        :param limit: fetch only this number of the latest rows, sorted from the most recent to the oldest
+        :type limit: Optional[int]
         :return: The raw rows selected as saved in the database
         :rtype: List[Tuple]
 
@@ -188,7 +266,24 @@ class BinanceDataBase(DataBase):
                                     SQLConditionEnum.lower,
                                     end_time))
 
-        return self.get_conditions_rows(table, conditions_list=conditions_list)
+        return self._get_history_rows(table, table.trfTime, conditions_list, limit)
+
+    def get_isolated_transfer_symbols(self) -> List[Tuple[str, str]]:
+        """
+        Return the distinct pairs of isolated symbol and asset found in the isolated transfers stored in the database
+
+        :return: list of (isolated symbol, asset)
+        :rtype: List[Tuple[str, str]]
+
+        .. code-block:: python
+
+            [
+                ('BTCBUSD',         # isolated symbol
+                'BTC'),             # asset
+            ]
+        """
+        table = tables.ISOLATED_MARGIN_TRANSFER_TABLE
+        return self.get_conditions_rows(table, selection=f"DISTINCT {table.symbol}, {table.asset}")
 
     def get_last_isolated_transfer_time(self, isolated_symbol: str) -> int:
         """
@@ -204,18 +299,8 @@ class BinanceDataBase(DataBase):
         conditions_list = [(table.symbol,
                             SQLConditionEnum.equal,
                             isolated_symbol)]
-        selection = f"MAX({table.trfTime})"
-        result = self.get_conditions_rows(table,
-                                          selection=selection,
-                                          conditions_list=conditions_list)
-        default = datetime_to_millistamp(datetime.datetime(2017, 1, 1, tzinfo=datetime.timezone.utc))
-        try:
-            result = result[0][0]
-        except IndexError:
-            return default
-        if result is None:
-            return default
-        return result
+        return self.fetch_scalar(table, f"MAX({table.trfTime})", conditions_list=conditions_list,
+                                 default=BinanceDataBase.DEFAULT_START_TIME)
 
     def add_margin_interest(self, interest_time: int, asset: str, interest: float, interest_type: str,
                             isolated_symbol: Optional[str] = None, auto_commit: bool = True):
@@ -238,17 +323,38 @@ class BinanceDataBase(DataBase):
         :return: None
         :rtype: None
         """
+        self.add_margin_interests([(interest_time, asset, interest, interest_type)], isolated_symbol=isolated_symbol,
+                                  auto_commit=auto_commit)
+
+    def add_margin_interests(self, interests: List[Tuple], isolated_symbol: Optional[str] = None,
+                             auto_commit: bool = True):
+        """
+        Add several margin interests to the database in a single statement
+
+        :param interests: interests to add, each one as (interest_time, asset, interest, interest_type)
+            (see add_margin_interest)
+        :type interests: List[Tuple]
+        :param isolated_symbol: for isolated margin, provided the trading symbol of all the interests otherwise they
+            will be counted a cross margin data
+        :type isolated_symbol: Optional[str]
+        :param auto_commit: if the database should commit the change made, default True
+        :type auto_commit: bool
+        :return: None
+        :rtype: None
+        """
         if isolated_symbol is None:
             table = tables.CROSS_MARGIN_INTEREST_TABLE
-            row = (interest_time, asset, interest, interest_type)
+            rows = interests
         else:
             table = tables.ISOLATED_MARGIN_INTEREST_TABLE
-            row = (interest_time, isolated_symbol, asset, interest, interest_type)
+            rows = [(interest_time, isolated_symbol, asset, interest, interest_type)
+                    for interest_time, asset, interest, interest_type in interests]
 
-        self.add_row(table, row, auto_commit=auto_commit)
+        self.add_rows(table, rows, auto_commit=auto_commit)
 
     def get_margin_interests(self, margin_type: str, asset: Optional[str] = None, isolated_symbol: Optional[str] = None,
-                             start_time: Optional[int] = None, end_time: Optional[int] = None):
+                             start_time: Optional[int] = None, end_time: Optional[int] = None,
+                             limit: Optional[int] = None):
         """
         Return margin interests stored in the database. Asset type and time filters can be used
 
@@ -262,6 +368,8 @@ class BinanceDataBase(DataBase):
         :type start_time: Optional[int]
         :param end_time: fetch only interests before this millistamp
         :type end_time: Optional[int]
+        :param limit: fetch only this number of the latest rows, sorted from the most recent to the oldest
+        :type limit: Optional[int]
         :return: The raw rows selected as saved in the database
         :rtype: List[Tuple]
 
@@ -309,7 +417,7 @@ class BinanceDataBase(DataBase):
             conditions_list.append((table.interestTime,
                                     SQLConditionEnum.lower,
                                     end_time))
-        return self.get_conditions_rows(table, conditions_list=conditions_list)
+        return self._get_history_rows(table, table.interestTime, conditions_list, limit)
 
     def get_last_margin_interest_time(self, asset: Optional[str] = None, isolated_symbol: Optional[str] = None) -> int:
         """
@@ -337,18 +445,8 @@ class BinanceDataBase(DataBase):
                                     SQLConditionEnum.equal,
                                     asset))
 
-        selection = f"MAX({table.interestTime})"
-        result = self.get_conditions_rows(table,
-                                          selection=selection,
-                                          conditions_list=conditions_list)
-        default = datetime_to_millistamp(datetime.datetime(2017, 1, 1, tzinfo=datetime.timezone.utc))
-        try:
-            result = result[0][0]
-        except IndexError:
-            return default
-        if result is None:
-            return default
-        return result
+        return self.fetch_scalar(table, f"MAX({table.interestTime})", conditions_list=conditions_list,
+                                 default=BinanceDataBase.DEFAULT_START_TIME)
 
     def add_repay(self, tx_id: int, repay_time: int, asset: str, principal: float,
                   interest: float, isolated_symbol: Optional[str] = None, auto_commit: bool = True):
@@ -373,17 +471,36 @@ class BinanceDataBase(DataBase):
         :return: None
         :rtype: None
         """
+        self.add_repays([(tx_id, repay_time, asset, principal, interest)], isolated_symbol=isolated_symbol,
+                        auto_commit=auto_commit)
+
+    def add_repays(self, repays: List[Tuple], isolated_symbol: Optional[str] = None, auto_commit: bool = True):
+        """
+        Add several repays to the database in a single statement.
+        The rows whose primary key is already saved are skipped
+
+        :param repays: repays to add, each one as (tx_id, repay_time, asset, principal, interest) (see add_repay)
+        :type repays: List[Tuple]
+        :param isolated_symbol: for isolated margin, provided the trading symbol of all the repays otherwise they
+            will be counted a cross margin data
+        :type isolated_symbol: Optional[str]
+        :param auto_commit: if the database should commit the change made, default True
+        :type auto_commit: bool
+        :return: None
+        :rtype: None
+        """
         if isolated_symbol is None:
             table = tables.CROSS_MARGIN_REPAY_TABLE
-            row = (tx_id, repay_time, asset, principal, interest)
+            rows = repays
         else:
             table = tables.ISOLATED_MARGIN_REPAY_TABLE
-            row = (tx_id, repay_time, isolated_symbol, asset, principal, interest)
+            rows = [(tx_id, repay_time, isolated_symbol, asset, principal, interest)
+                    for tx_id, repay_time, asset, principal, interest in repays]
 
-        self.add_row(table, row, auto_commit=auto_commit)
+        self.add_rows(table, rows, auto_commit=auto_commit, ignore_if_exists=True)
 
     def get_repays(self, margin_type: str, asset: Optional[str] = None, isolated_symbol: Optional[str] = None,
-                   start_time: Optional[int] = None, end_time: Optional[int] = None):
+                   start_time: Optional[int] = None, end_time: Optional[int] = None, limit: Optional[int] = None):
         """
         Return repays stored in the database. Asset type and time filters can be used
 
@@ -397,6 +514,8 @@ class BinanceDataBase(DataBase):
         :type start_time: Optional[int]
         :param end_time: fetch only repays before this millistamp
         :type end_time: Optional[int]
+        :param limit: fetch only this number of the latest rows, sorted from the most recent to the oldest
+        :type limit: Optional[int]
         :return: The raw rows selected as saved in the database
         :rtype: List[Tuple]
 
@@ -446,7 +565,7 @@ class BinanceDataBase(DataBase):
             conditions_list.append((table.repayTime,
                                     SQLConditionEnum.lower,
                                     end_time))
-        return self.get_conditions_rows(table, conditions_list=conditions_list)
+        return self._get_history_rows(table, table.repayTime, conditions_list, limit)
 
     def get_last_repay_time(self, asset: str, isolated_symbol: Optional[str] = None) -> int:
         """
@@ -473,18 +592,8 @@ class BinanceDataBase(DataBase):
                                 SQLConditionEnum.equal,
                                 asset))
 
-        selection = f"MAX({table.repayTime})"
-        result = self.get_conditions_rows(table,
-                                          selection=selection,
-                                          conditions_list=conditions_list)
-        default = datetime_to_millistamp(datetime.datetime(2017, 1, 1, tzinfo=datetime.timezone.utc))
-        try:
-            result = result[0][0]
-        except IndexError:
-            return default
-        if result is None:
-            return default
-        return result
+        return self.fetch_scalar(table, f"MAX({table.repayTime})", conditions_list=conditions_list,
+                                 default=BinanceDataBase.DEFAULT_START_TIME)
 
     def add_loan(self, tx_id: int, loan_time: int, asset: str, principal: float,
                  isolated_symbol: Optional[str] = None, auto_commit: bool = True):
@@ -507,17 +616,36 @@ class BinanceDataBase(DataBase):
         :return: None
         :rtype: None
         """
+        self.add_loans([(tx_id, loan_time, asset, principal)], isolated_symbol=isolated_symbol,
+                       auto_commit=auto_commit)
+
+    def add_loans(self, loans: List[Tuple], isolated_symbol: Optional[str] = None, auto_commit: bool = True):
+        """
+        Add several loans to the database in a single statement.
+        The rows whose primary key is already saved are skipped
+
+        :param loans: loans to add, each one as (tx_id, loan_time, asset, principal) (see add_loan)
+        :type loans: List[Tuple]
+        :param isolated_symbol: for isolated margin, provided the trading symbol of all the loans otherwise they
+            will be counted a cross margin data
+        :type isolated_symbol: Optional[str]
+        :param auto_commit: if the database should commit the change made, default True
+        :type auto_commit: bool
+        :return: None
+        :rtype: None
+        """
         if isolated_symbol is None:
             table = tables.CROSS_MARGIN_LOAN_TABLE
-            row = (tx_id, loan_time, asset, principal)
+            rows = loans
         else:
-            row = (tx_id, loan_time, isolated_symbol, asset, principal)
             table = tables.ISOLATED_MARGIN_LOAN_TABLE
+            rows = [(tx_id, loan_time, isolated_symbol, asset, principal)
+                    for tx_id, loan_time, asset, principal in loans]
 
-        self.add_row(table, row, auto_commit=auto_commit)
+        self.add_rows(table, rows, auto_commit=auto_commit, ignore_if_exists=True)
 
     def get_loans(self, margin_type: str, asset: Optional[str] = None, isolated_symbol: Optional[str] = None,
-                  start_time: Optional[int] = None, end_time: Optional[int] = None):
+                  start_time: Optional[int] = None, end_time: Optional[int] = None, limit: Optional[int] = None):
         """
         Return loans stored in the database. Asset type and time filters can be used
 
@@ -531,6 +659,8 @@ class BinanceDataBase(DataBase):
         :type start_time: Optional[int]
         :param end_time: fetch only loans before this millistamp
         :type end_time: Optional[int]
+        :param limit: fetch only this number of the latest rows, sorted from the most recent to the oldest
+        :type limit: Optional[int]
         :return: The raw rows selected as saved in the database
         :rtype: List[Tuple]
 
@@ -579,7 +709,7 @@ class BinanceDataBase(DataBase):
             conditions_list.append((table.loanTime,
                                     SQLConditionEnum.lower,
                                     end_time))
-        return self.get_conditions_rows(table, conditions_list=conditions_list)
+        return self._get_history_rows(table, table.loanTime, conditions_list, limit)
 
     def get_last_loan_time(self, asset: str, isolated_symbol: Optional[str] = None) -> int:
         """
@@ -605,18 +735,8 @@ class BinanceDataBase(DataBase):
         conditions_list.append((table.asset,
                                 SQLConditionEnum.equal,
                                 asset))
-        selection = f"MAX({table.loanTime})"
-        result = self.get_conditions_rows(table,
-                                          selection=selection,
-                                          conditions_list=conditions_list)
-        default = datetime_to_millistamp(datetime.datetime(2017, 1, 1, tzinfo=datetime.timezone.utc))
-        try:
-            result = result[0][0]
-        except IndexError:
-            return default
-        if result is None:
-            return default
-        return result
+        return self.fetch_scalar(table, f"MAX({table.loanTime})", conditions_list=conditions_list,
+                                 default=BinanceDataBase.DEFAULT_START_TIME)
 
     def add_lending_redemption(self, redemption_time: int, lending_type: str, asset: str, amount: float,
                                auto_commit: bool = True):
@@ -636,11 +756,25 @@ class BinanceDataBase(DataBase):
         :return: None
         :rtype: None
         """
-        row = (redemption_time, lending_type, asset, amount)
-        self.add_row(tables.LENDING_REDEMPTION_TABLE, row, auto_commit=auto_commit)
+        self.add_lending_redemptions([(redemption_time, lending_type, asset, amount)], auto_commit=auto_commit)
+
+    def add_lending_redemptions(self, redemptions: List[Tuple], auto_commit: bool = True):
+        """
+        Add several lending redemptions to the database in a single statement
+
+        :param redemptions: redemptions to add, each one as (redemption_time, lending_type, asset, amount)
+            (see add_lending_redemption)
+        :type redemptions: List[Tuple]
+        :param auto_commit: if the database should commit the change made, default True
+        :type auto_commit: bool
+        :return: None
+        :rtype: None
+        """
+        self.add_rows(tables.LENDING_REDEMPTION_TABLE, redemptions, auto_commit=auto_commit)
 
     def get_lending_redemptions(self, lending_type: Optional[str] = None, asset: Optional[str] = None,
-                                start_time: Optional[int] = None, end_time: Optional[int] = None):
+                                start_time: Optional[int] = None, end_time: Optional[int] = None,
+                                limit: Optional[int] = None):
         """
         Return lending redemptions stored in the database. Asset type and time filters can be used
 
@@ -652,6 +786,8 @@ class BinanceDataBase(DataBase):
         :type start_time: Optional[int]
         :param end_time: fetch only redemptions before this millistamp
         :type end_time: Optional[int]
+        :param limit: fetch only this number of the latest rows, sorted from the most recent to the oldest
+        :type limit: Optional[int]
         :return: The raw rows selected as saved in the database
         :rtype: List[Tuple]
 
@@ -682,7 +818,7 @@ class BinanceDataBase(DataBase):
             conditions_list.append((table.redemptionTime,
                                     SQLConditionEnum.lower,
                                     end_time))
-        return self.get_conditions_rows(table, conditions_list=conditions_list)
+        return self._get_history_rows(table, table.redemptionTime, conditions_list, limit)
 
     def get_last_lending_redemption_time(self, lending_type: Optional[str] = None) -> int:
         """
@@ -700,18 +836,8 @@ class BinanceDataBase(DataBase):
             conditions_list.append((table.lendingType,
                                     SQLConditionEnum.equal,
                                     lending_type))
-        selection = f"MAX({table.redemptionTime})"
-        result = self.get_conditions_rows(table,
-                                          selection=selection,
-                                          conditions_list=conditions_list)
-        default = datetime_to_millistamp(datetime.datetime(2017, 1, 1, tzinfo=datetime.timezone.utc))
-        try:
-            result = result[0][0]
-        except IndexError:
-            return default
-        if result is None:
-            return default
-        return result
+        return self.fetch_scalar(table, f"MAX({table.redemptionTime})", conditions_list=conditions_list,
+                                 default=BinanceDataBase.DEFAULT_START_TIME)
 
     def add_lending_purchase(self, purchase_id: int, purchase_time: int, lending_type: str, asset: str, amount: float,
                              auto_commit: bool = True):
@@ -733,11 +859,27 @@ class BinanceDataBase(DataBase):
         :return: None
         :rtype: None
         """
-        row = (purchase_id, purchase_time, lending_type, asset, amount)
-        self.add_row(tables.LENDING_PURCHASE_TABLE, row, auto_commit=auto_commit)
+        self.add_lending_purchases([(purchase_id, purchase_time, lending_type, asset, amount)],
+                                   auto_commit=auto_commit)
+
+    def add_lending_purchases(self, purchases: List[Tuple], auto_commit: bool = True):
+        """
+        Add several lending purchases to the database in a single statement.
+        The rows whose primary key is already saved are skipped
+
+        :param purchases: purchases to add, each one as (purchase_id, purchase_time, lending_type, asset, amount)
+            (see add_lending_purchase)
+        :type purchases: List[Tuple]
+        :param auto_commit: if the database should commit the change made, default True
+        :type auto_commit: bool
+        :return: None
+        :rtype: None
+        """
+        self.add_rows(tables.LENDING_PURCHASE_TABLE, purchases, auto_commit=auto_commit, ignore_if_exists=True)
 
     def get_lending_purchases(self, lending_type: Optional[str] = None, asset: Optional[str] = None,
-                              start_time: Optional[int] = None, end_time: Optional[int] = None):
+                              start_time: Optional[int] = None, end_time: Optional[int] = None,
+                              limit: Optional[int] = None):
         """
         Return lending purchases stored in the database. Asset type and time filters can be used
 
@@ -749,6 +891,8 @@ class BinanceDataBase(DataBase):
         :type start_time: Optional[int]
         :param end_time: fetch only purchases before this millistamp
         :type end_time: Optional[int]
+        :param limit: fetch only this number of the latest rows, sorted from the most recent to the oldest
+        :type limit: Optional[int]
         :return: The raw rows selected as saved in the database
         :rtype: List[Tuple]
 
@@ -780,7 +924,7 @@ class BinanceDataBase(DataBase):
             conditions_list.append((table.purchaseTime,
                                     SQLConditionEnum.lower,
                                     end_time))
-        return self.get_conditions_rows(table, conditions_list=conditions_list)
+        return self._get_history_rows(table, table.purchaseTime, conditions_list, limit)
 
     def get_last_lending_purchase_time(self, lending_type: Optional[str] = None) -> int:
         """
@@ -798,18 +942,8 @@ class BinanceDataBase(DataBase):
             conditions_list.append((table.lendingType,
                                     SQLConditionEnum.equal,
                                     lending_type))
-        selection = f"MAX({table.purchaseTime})"
-        result = self.get_conditions_rows(table,
-                                          selection=selection,
-                                          conditions_list=conditions_list)
-        default = datetime_to_millistamp(datetime.datetime(2017, 1, 1, tzinfo=datetime.timezone.utc))
-        try:
-            result = result[0][0]
-        except IndexError:
-            return default
-        if result is None:
-            return default
-        return result
+        return self.fetch_scalar(table, f"MAX({table.purchaseTime})", conditions_list=conditions_list,
+                                 default=BinanceDataBase.DEFAULT_START_TIME)
 
     def add_lending_interest(self, time: int, lending_type: str, asset: str, amount: float,
                              auto_commit: bool = True):
@@ -829,11 +963,25 @@ class BinanceDataBase(DataBase):
         :return: None
         :rtype: None
         """
-        row = (time, lending_type, asset, amount)
-        self.add_row(tables.LENDING_INTEREST_TABLE, row, auto_commit=auto_commit)
+        self.add_lending_interests([(time, lending_type, asset, amount)], auto_commit=auto_commit)
+
+    def add_lending_interests(self, interests: List[Tuple], auto_commit: bool = True):
+        """
+        Add several lending interests to the database in a single statement
+
+        :param interests: interests to add, each one as (time, lending_type, asset, amount)
+            (see add_lending_interest)
+        :type interests: List[Tuple]
+        :param auto_commit: if the database should commit the change made, default True
+        :type auto_commit: bool
+        :return: None
+        :rtype: None
+        """
+        self.add_rows(tables.LENDING_INTEREST_TABLE, interests, auto_commit=auto_commit)
 
     def get_lending_interests(self, lending_type: Optional[str] = None, asset: Optional[str] = None,
-                              start_time: Optional[int] = None, end_time: Optional[int] = None):
+                              start_time: Optional[int] = None, end_time: Optional[int] = None,
+                              limit: Optional[int] = None):
         """
         Return lending interests stored in the database. Asset type and time filters can be used
 
@@ -845,6 +993,8 @@ class BinanceDataBase(DataBase):
         :type start_time: Optional[int]
         :param end_time: fetch only interests before this millistamp
         :type end_time: Optional[int]
+        :param limit: fetch only this number of the latest rows, sorted from the most recent to the oldest
+        :type limit: Optional[int]
         :return: The raw rows selected as saved in the database
         :rtype: List[Tuple]
 
@@ -876,7 +1026,7 @@ class BinanceDataBase(DataBase):
             conditions_list.append((table.interestTime,
                                     SQLConditionEnum.lower,
                                     end_time))
-        return self.get_conditions_rows(table, conditions_list=conditions_list)
+        return self._get_history_rows(table, table.interestTime, conditions_list, limit)
 
     def get_last_lending_interest_time(self, lending_type: Optional[str] = None) -> int:
         """
@@ -894,18 +1044,8 @@ class BinanceDataBase(DataBase):
             conditions_list.append((table.lendingType,
                                     SQLConditionEnum.equal,
                                     lending_type))
-        selection = f"MAX({table.interestTime})"
-        result = self.get_conditions_rows(table,
-                                          selection=selection,
-                                          conditions_list=conditions_list)
-        default = datetime_to_millistamp(datetime.datetime(2017, 1, 1, tzinfo=datetime.timezone.utc))
-        try:
-            result = result[0][0]
-        except IndexError:
-            return default
-        if result is None:
-            return default
-        return result
+        return self.fetch_scalar(table, f"MAX({table.interestTime})", conditions_list=conditions_list,
+                                 default=BinanceDataBase.DEFAULT_START_TIME)
 
     def add_spot_dust(self, tran_id: str, time: int, asset: str, asset_amount: float, bnb_amount: float, bnb_fee: float,
                       auto_commit: bool = True):
@@ -929,12 +1069,24 @@ class BinanceDataBase(DataBase):
         :return: None
         :rtype: None
         """
+        self.add_spot_dusts([(tran_id, time, asset, asset_amount, bnb_amount, bnb_fee)], auto_commit=auto_commit)
 
-        row = (tran_id, time, asset, asset_amount, bnb_amount, bnb_fee)
-        self.add_row(tables.SPOT_DUST_TABLE, row, auto_commit=auto_commit)
+    def add_spot_dusts(self, dusts: List[Tuple], auto_commit: bool = True):
+        """
+        Add several dust operations to the database in a single statement
+
+        :param dusts: dusts to add, each one as (tran_id, time, asset, asset_amount, bnb_amount, bnb_fee)
+            (see add_spot_dust)
+        :type dusts: List[Tuple]
+        :param auto_commit: if the database should commit the change made, default True
+        :type auto_commit: bool
+        :return: None
+        :rtype: None
+        """
+        self.add_rows(tables.SPOT_DUST_TABLE, dusts, auto_commit=auto_commit)
 
     def get_spot_dusts(self, asset: Optional[str] = None, start_time: Optional[int] = None,
-                       end_time: Optional[int] = None):
+                       end_time: Optional[int] = None, limit: Optional[int] = None):
         """
         Return dusts stored in the database. Asset type and time filters can be used
 
@@ -944,6 +1096,8 @@ class BinanceDataBase(DataBase):
         :type start_time: Optional[int]
         :param end_time: fetch only dusts before this millistamp
         :type end_time: Optional[int]
+        :param limit: fetch only this number of the latest rows, sorted from the most recent to the oldest
+        :type limit: Optional[int]
         :return: The raw rows selected as saved in the database
         :rtype: List[Tuple]
 
@@ -972,7 +1126,19 @@ class BinanceDataBase(DataBase):
             conditions_list.append((table.dustTime,
                                     SQLConditionEnum.lower,
                                     end_time))
-        return self.get_conditions_rows(table, conditions_list=conditions_list)
+        return self._get_history_rows(table, table.dustTime, conditions_list, limit)
+
+    def get_spot_dust_tran_ids(self) -> Set[int]:
+        """
+        Return the ids of the dust transactions stored in the database. A transaction converts one or several assets
+        at once, so it is either entirely saved or not at all.
+
+        :return: ids of the dust transactions
+        :rtype: Set[int]
+        """
+        table = tables.SPOT_DUST_TABLE
+        rows = self.get_conditions_rows(table, selection=f"DISTINCT {table.tranId}")
+        return {row[0] for row in rows}
 
     def add_dividend(self, div_id: int, div_time: int, asset: str, amount: float, auto_commit: bool = True):
         """
@@ -991,11 +1157,24 @@ class BinanceDataBase(DataBase):
         :return: None
         :rtype: None
         """
-        row = (div_id, div_time, asset, amount)
-        self.add_row(tables.SPOT_DIVIDEND_TABLE, row, auto_commit=auto_commit)
+        self.add_dividends([(div_id, div_time, asset, amount)], auto_commit=auto_commit)
+
+    def add_dividends(self, dividends: List[Tuple], auto_commit: bool = True):
+        """
+        Add several dividends to the database in a single statement.
+        The rows whose primary key is already saved are skipped
+
+        :param dividends: dividends to add, each one as (div_id, div_time, asset, amount) (see add_dividend)
+        :type dividends: List[Tuple]
+        :param auto_commit: if the database should commit the change made, default True
+        :type auto_commit: bool
+        :return: None
+        :rtype: None
+        """
+        self.add_rows(tables.SPOT_DIVIDEND_TABLE, dividends, auto_commit=auto_commit, ignore_if_exists=True)
 
     def get_spot_dividends(self, asset: Optional[str] = None, start_time: Optional[int] = None,
-                           end_time: Optional[int] = None):
+                           end_time: Optional[int] = None, limit: Optional[int] = None):
         """
         Return dividends stored in the database. Asset type and time filters can be used
 
@@ -1005,6 +1184,8 @@ class BinanceDataBase(DataBase):
         :type start_time: Optional[int]
         :param end_time: fetch only dividends before this millistamp
         :type end_time: Optional[int]
+        :param limit: fetch only this number of the latest rows, sorted from the most recent to the oldest
+        :type limit: Optional[int]
         :return: The raw rows selected as saved in the database
         :rtype: List[Tuple]
 
@@ -1032,7 +1213,7 @@ class BinanceDataBase(DataBase):
             conditions_list.append((table.divTime,
                                     SQLConditionEnum.lower,
                                     end_time))
-        return self.get_conditions_rows(table, conditions_list=conditions_list)
+        return self._get_history_rows(table, table.divTime, conditions_list, limit)
 
     def get_last_spot_dividend_time(self) -> int:
         """
@@ -1042,18 +1223,7 @@ class BinanceDataBase(DataBase):
         :return:
         """
         table = tables.SPOT_DIVIDEND_TABLE
-        selection = f"MAX({table.divTime})"
-        result = self.get_conditions_rows(table,
-                                          selection=selection)
-
-        default = datetime_to_millistamp(datetime.datetime(2017, 1, 1, tzinfo=datetime.timezone.utc))
-        try:
-            result = result[0][0]
-        except IndexError:
-            return default
-        if result is None:
-            return default
-        return result
+        return self.fetch_scalar(table, f"MAX({table.divTime})", default=BinanceDataBase.DEFAULT_START_TIME)
 
     def add_withdraw(self, withdraw_id: str, tx_id: str, apply_time: int, asset: str, amount: float, fee: float,
                      auto_commit: bool = True):
@@ -1077,11 +1247,25 @@ class BinanceDataBase(DataBase):
         :return: None
         :rtype: None
         """
-        row = (withdraw_id, tx_id, apply_time, asset, amount, fee)
-        self.add_row(tables.SPOT_WITHDRAW_TABLE, row, auto_commit=auto_commit)
+        self.add_withdraws([(withdraw_id, tx_id, apply_time, asset, amount, fee)], auto_commit=auto_commit)
+
+    def add_withdraws(self, withdraws: List[Tuple], auto_commit: bool = True):
+        """
+        Add several withdraws to the database in a single statement.
+        The rows whose primary key is already saved are skipped
+
+        :param withdraws: withdraws to add, each one as (withdraw_id, tx_id, apply_time, asset, amount, fee)
+            (see add_withdraw)
+        :type withdraws: List[Tuple]
+        :param auto_commit: if the database should commit the change made, default True
+        :type auto_commit: bool
+        :return: None
+        :rtype: None
+        """
+        self.add_rows(tables.SPOT_WITHDRAW_TABLE, withdraws, auto_commit=auto_commit, ignore_if_exists=True)
 
     def get_spot_withdraws(self, asset: Optional[str] = None, start_time: Optional[int] = None,
-                           end_time: Optional[int] = None):
+                           end_time: Optional[int] = None, limit: Optional[int] = None):
         """
         Return withdraws stored in the database. Asset type and time filters can be used
 
@@ -1091,6 +1275,8 @@ class BinanceDataBase(DataBase):
         :type start_time: Optional[int]
         :param end_time: fetch only withdraws before this millistamp
         :type end_time: Optional[int]
+        :param limit: fetch only this number of the latest rows, sorted from the most recent to the oldest
+        :type limit: Optional[int]
         :return: The raw rows selected as saved in the database
         :rtype: List[Tuple]
 
@@ -1120,7 +1306,7 @@ class BinanceDataBase(DataBase):
             conditions_list.append((table.applyTime,
                                     SQLConditionEnum.lower,
                                     end_time))
-        return self.get_conditions_rows(table, conditions_list=conditions_list)
+        return self._get_history_rows(table, table.applyTime, conditions_list, limit)
 
     def get_last_spot_withdraw_time(self) -> int:
         """
@@ -1130,17 +1316,7 @@ class BinanceDataBase(DataBase):
         :return:
         """
         table = tables.SPOT_WITHDRAW_TABLE
-        selection = f"MAX({table.applyTime})"
-        result = self.get_conditions_rows(table,
-                                          selection=selection)
-        default = datetime_to_millistamp(datetime.datetime(2017, 1, 1, tzinfo=datetime.timezone.utc))
-        try:
-            result = result[0][0]
-        except IndexError:
-            return default
-        if result is None:
-            return default
-        return result
+        return self.fetch_scalar(table, f"MAX({table.applyTime})", default=BinanceDataBase.DEFAULT_START_TIME)
 
     def add_deposit(self, tx_id: str, insert_time: int, amount: float, asset: str, auto_commit=True):
         """
@@ -1159,11 +1335,25 @@ class BinanceDataBase(DataBase):
         :return: None
         :rtype: None
         """
-        row = (tx_id, insert_time, asset, amount)
-        self.add_row(tables.SPOT_DEPOSIT_TABLE, row, auto_commit)
+        self.add_deposits([(tx_id, insert_time, amount, asset)], auto_commit=auto_commit)
+
+    def add_deposits(self, deposits: List[Tuple], auto_commit: bool = True):
+        """
+        Add several deposits to the database in a single statement.
+        The rows whose primary key is already saved are skipped
+
+        :param deposits: deposits to add, each one as (tx_id, insert_time, amount, asset) (see add_deposit)
+        :type deposits: List[Tuple]
+        :param auto_commit: if the database should commit the change made, default True
+        :type auto_commit: bool
+        :return: None
+        :rtype: None
+        """
+        rows = [(tx_id, insert_time, asset, amount) for tx_id, insert_time, amount, asset in deposits]
+        self.add_rows(tables.SPOT_DEPOSIT_TABLE, rows, auto_commit=auto_commit, ignore_if_exists=True)
 
     def get_spot_deposits(self, asset: Optional[str] = None, start_time: Optional[int] = None,
-                          end_time: Optional[int] = None):
+                          end_time: Optional[int] = None, limit: Optional[int] = None):
         """
         Return deposits stored in the database. Asset type and time filters can be used
 
@@ -1173,6 +1363,8 @@ class BinanceDataBase(DataBase):
         :type start_time: Optional[int]
         :param end_time: fetch only deposits before this millistamp
         :type end_time: Optional[int]
+        :param limit: fetch only this number of the latest rows, sorted from the most recent to the oldest
+        :type limit: Optional[int]
         :return: The raw rows selected as saved in the database
         :rtype: List[Tuple]
 
@@ -1200,7 +1392,7 @@ class BinanceDataBase(DataBase):
             conditions_list.append((table.insertTime,
                                     SQLConditionEnum.lower,
                                     end_time))
-        return self.get_conditions_rows(table, conditions_list=conditions_list)
+        return self._get_history_rows(table, table.insertTime, conditions_list, limit)
 
     def get_last_spot_deposit_time(self) -> int:
         """
@@ -1211,18 +1403,7 @@ class BinanceDataBase(DataBase):
         :rtype: int
         """
         table = tables.SPOT_DEPOSIT_TABLE
-        selection = f"MAX({table.insertTime})"
-        result = self.get_conditions_rows(table,
-                                          selection=selection)
-
-        default = datetime_to_millistamp(datetime.datetime(2017, 1, 1, tzinfo=datetime.timezone.utc))
-        try:
-            result = result[0][0]
-        except IndexError:
-            return default
-        if result is None:
-            return default
-        return result
+        return self.fetch_scalar(table, f"MAX({table.insertTime})", default=BinanceDataBase.DEFAULT_START_TIME)
 
     def add_trade(self, trade_type: str, trade_id: int, trade_time: int, asset: str, ref_asset: str, qty: float,
                   price: float, fee: float, fee_asset: str, is_buyer: bool, symbol: Optional[str] = None,
@@ -1257,7 +1438,27 @@ class BinanceDataBase(DataBase):
         :return: None
         :rtype: None
         """
-        row = (trade_id, trade_time, asset, ref_asset, qty, price, fee, fee_asset, int(is_buyer))
+        self.add_trades(trade_type, [(trade_id, trade_time, asset, ref_asset, qty, price, fee, fee_asset, is_buyer)],
+                        symbol=symbol, auto_commit=auto_commit)
+
+    def add_trades(self, trade_type: str, trades: List[Tuple], symbol: Optional[str] = None,
+                   auto_commit: bool = True):
+        """
+        Add several trades to the database in a single statement
+
+        :param trade_type: type trade executed
+        :type trade_type: string, must be one of {'spot', 'cross_margin', 'isolated_margin'}
+        :param trades: trades to add, each one as
+            (trade_id, trade_time, asset, ref_asset, qty, price, fee, fee_asset, is_buyer) (see add_trade)
+        :type trades: List[Tuple]
+        :param symbol: trading symbol of all the trades, mandatory if thr trade_type is isolated margin
+        :type symbol: Optional[str]
+        :param auto_commit: if the database should commit the change made, default True
+        :type auto_commit: bool
+        :return: None
+        :rtype: None
+        """
+        rows = [tuple(trade[:-1]) + (int(trade[-1]),) for trade in trades]  # is_buyer is stored as an integer
         if trade_type == 'spot':
             table = tables.SPOT_TRADE_TABLE
         elif trade_type == 'cross_margin':
@@ -1266,15 +1467,15 @@ class BinanceDataBase(DataBase):
             table = tables.ISOLATED_MARGIN_TRADE_TABLE
             if symbol is None:
                 raise ValueError("trade_type was isolated margin but symbol was not provided")
-            row = (trade_id, trade_time, symbol, asset, ref_asset, qty, price, fee, fee_asset, int(is_buyer))
+            rows = [row[:2] + (symbol,) + row[2:] for row in rows]
         else:
             msg = f"trade type should be one of ('spot', 'cross_margin', 'isolated_margin') but {trade_type} was" \
                   f" received"
             raise ValueError(msg)
-        self.add_row(table, row, auto_commit)
+        self.add_rows(table, rows, auto_commit=auto_commit)
 
     def get_trades(self, trade_type: str, start_time: Optional[int] = None, end_time: Optional[int] = None,
-                   asset: Optional[str] = None, ref_asset: Optional[str] = None):
+                   asset: Optional[str] = None, ref_asset: Optional[str] = None, limit: Optional[int] = None):
         """
         Return trades stored in the database. asset type, ref_asset type and time filters can be used
 
@@ -1284,6 +1485,8 @@ class BinanceDataBase(DataBase):
         :type start_time: Optional[int]
         :param end_time: fetch only trades before this millistamp
         :type end_time: Optional[int]
+        :param limit: fetch only this number of the latest rows, sorted from the most recent to the oldest
+        :type limit: Optional[int]
         :param asset: fetch only trades with this asset
         :type asset: Optional[str]
         :param ref_asset:  fetch only trades with this ref_asset
@@ -1353,7 +1556,8 @@ class BinanceDataBase(DataBase):
             conditions_list.append((table.refAsset,
                                     SQLConditionEnum.equal,
                                     ref_asset))
-        return self.get_conditions_rows(table, conditions_list=conditions_list, order_list=[table.tdTime])
+        return self.get_conditions_rows(table, conditions_list=conditions_list, order_list=[table.tdTime],
+                                        descending=limit is not None, limit=limit)
 
     def get_max_trade_id(self, asset: str, ref_asset: str, trade_type: str) -> int:
         """
@@ -1379,7 +1583,6 @@ class BinanceDataBase(DataBase):
                   f" received"
             raise ValueError(msg)
 
-        selection = f"MAX({table.tradeId})"
         conditions_list = [
             (table.asset,
              SQLConditionEnum.equal,
@@ -1388,11 +1591,52 @@ class BinanceDataBase(DataBase):
              SQLConditionEnum.equal,
              ref_asset)
         ]
-        result = self.get_conditions_rows(table, selection=selection, conditions_list=conditions_list)
-        try:
-            result = result[0][0]
-        except IndexError:
-            return -1
-        if result is None:
-            return -1
-        return result
+        return self.fetch_scalar(table, f"MAX({table.tradeId})", conditions_list=conditions_list, default=-1)
+
+    def get_spot_assets(self) -> Set[str]:
+        """
+        Return the assets appearing in the spot history stored in the database: the assets of the spot trades, the
+        deposits, the withdraws, the dusts, the dividends and the universal transfers
+
+        :return: names of the assets
+        :rtype: Set[str]
+        """
+        assets = set()
+        for table in (tables.SPOT_DEPOSIT_TABLE, tables.SPOT_WITHDRAW_TABLE, tables.SPOT_DUST_TABLE,
+                      tables.SPOT_DIVIDEND_TABLE, tables.UNIVERSAL_TRANSFER_TABLE):
+            rows = self.get_conditions_rows(table, selection=f"DISTINCT {table.asset}")
+            assets.update(row[0] for row in rows)
+        table = tables.SPOT_TRADE_TABLE
+        for row in self.get_conditions_rows(table, selection=f"DISTINCT {table.asset}, {table.refAsset}"):
+            assets.update(row)
+        return assets
+
+    def set_sync_time(self, sync_key: str, sync_time: int, auto_commit: bool = True):
+        """
+        Save the time of the last successful update of a data stream
+
+        :param sync_key: identifier of the data stream (ex: 'cross_margin_repays_BTC')
+        :type sync_key: str
+        :param sync_time: millistamp when the update started
+        :type sync_time: int
+        :param auto_commit: if the database should commit the change made, default True
+        :type auto_commit: bool
+        :return: None
+        :rtype: None
+        """
+        self.add_rows(tables.SYNC_STATE_TABLE, [(sync_key, sync_time)], auto_commit=auto_commit, update_if_exists=True)
+
+    def get_sync_time(self, sync_key: str) -> Optional[int]:
+        """
+        Return the time of the last successful update of a data stream
+        If it was never updated, return None
+
+        :param sync_key: identifier of the data stream (ex: 'cross_margin_repays_BTC')
+        :type sync_key: str
+        :return: millistamp
+        :rtype: Optional[int]
+        """
+        row = self.get_row_by_key(tables.SYNC_STATE_TABLE, sync_key)
+        if row is None:
+            return None
+        return row[1]
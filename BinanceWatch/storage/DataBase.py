@@ -1,5 +1,7 @@
+from contextlib import contextmanager
 from enum import Enum
-from typing import List, Tuple, Optional, Any, Union
+from functools import lru_cache
+from typing import List, Tuple, Optional, Any, Union, Sequence
 import sqlite3
 
 from BinanceWatch.storage.tables import Table
@@ -26,6 +28,8 @@ class DataBase:
     This class will be used to interact with sqlite3 databases without having to generates sqlite commands
     """
 
+    CACHED_STATEMENTS = 256
+
     def __init__(self, name: str):
         """
         Initialise a DataBase instance
@@ -38,16 +42,19 @@ class DataBase:
         self.save_path = get_data_path() / f"{name}.db"
         self.db_conn = None
         self.db_cursor = None
+        self._transaction_depth = 0
         self.connect()
 
     def connect(self):
         """
-        Connect to the sqlite3 database
+        Connect to the sqlite3 database. The connection keeps the compiled statements of the last
+        CACHED_STATEMENTS distinct SQL commands, so the inserts, which always use the same command for a table
+        (see get_insert_cmd), are prepared only once.
 
         :return: None
         :rtype: None
         """
-        self.db_conn = sqlite3.connect(self.save_path)
+        self.db_conn = sqlite3.connect(self.save_path, cached_statements=DataBase.CACHED_STATEMENTS)
         self.db_cursor = self.db_conn.cursor()
 
     def close(self):
@@ -59,26 +66,22 @@ class DataBase:
         """
         self.db_conn.close()
 
-    def _fetch_rows(self, execution_cmd: str) -> List[Tuple]:
+    def _fetch_rows(self, execution_cmd: str, params: Sequence = ()) -> List[Tuple]:
         """
         Execute a command to fetch some rows and return them
 
         :param execution_cmd: the command to execute
         :type execution_cmd: str
+        :param params: values bound to the '?' placeholders of the command
+        :type params: Sequence
         :return: list of the table's rows selected by the command
         :rtype: List[Tuple]
         """
-        rows = []
         try:
-            self.db_cursor.execute(execution_cmd)
+            self.db_cursor.execute(execution_cmd, params)
         except sqlite3.OperationalError:
-            return rows
-        while True:
-            row = self.db_cursor.fetchone()
-            if row is None:
-                break
-            rows.append(row)
-        return rows
+            return []
+        return self.db_cursor.fetchall()
 
     def get_row_by_key(self, table: Table, key_value) -> Optional[Tuple]:
         """
@@ -101,9 +104,11 @@ class DataBase:
     def get_conditions_rows(self, table: Table,
                             selection: Union[str, List[str]] = '*',
                             conditions_list: Optional[List[Tuple[str, SQLConditionEnum, Any]]] = None,
-                            order_list: Optional[List[str]] = None) -> List[Tuple]:
+                            order_list: Optional[List[str]] = None, descending: bool = False,
+                            limit: Optional[int] = None) -> List[Tuple]:
         """
-        Select rows with optional conditions and optional order
+        Select rows with optional conditions and optional order. The values of the conditions are bound as
+        parameters, so the command only depends on the shape of the query and is built and prepared only once.
 
         :param table: table to select the rows from
         :type table: Table
@@ -113,19 +118,57 @@ class DataBase:
         :type conditions_list: Optional[List[Tuple[str, SQLConditionEnum, Any]]]
         :param order_list: List of SQL type order by
         :type order_list: Optional[List[str]]
+        :param descending: if the rows should be sorted in descending order instead of ascending order
+        :type descending: bool
+        :param limit: maximum number of rows to return, default no limit
+        :type limit: Optional[int]
         :return: the selected rows
         :rtype: List[Tuple]
         """
+        if limit is not None and limit < 0:
+            raise ValueError(f"limit should be positive but {limit} was received")
         if isinstance(selection, List):
             selection = ','.join(selection)
         if conditions_list is None:
             conditions_list = []
         if order_list is None:
             order_list = []
-        execution_cmd = f"SELECT {selection} from {table.name}"
-        execution_cmd = self._add_conditions(execution_cmd, conditions_list=conditions_list)
-        execution_cmd = self._add_order(execution_cmd, order_list=order_list)
-        return self._fetch_rows(execution_cmd)
+        conditions = tuple((column_name, condition) for column_name, condition, _ in conditions_list)
+        execution_cmd = self.get_select_cmd(table, selection, conditions, tuple(order_list), descending,
+                                            limit is not None)
+        params = [value for _, _, value in conditions_list]
+        if limit is not None:
+            params.append(limit)
+        return self._fetch_rows(execution_cmd, params)
+
+    def fetch_scalar(self, table: Table, expression: str,
+                     conditions_list: Optional[List[Tuple[str, SQLConditionEnum, Any]]] = None, default: Any = None):
+        """
+        Select a single value, typically an aggregate, with optional conditions. The values of the conditions are
+        bound as parameters, so the command of a call site is always the same and is prepared only once.
+
+        :param table: table to select the value from
+        :type table: Table
+        :param expression: SQL expression of the value to select (ex: 'MAX(time)')
+        :type expression: str
+        :param conditions_list: list of conditions to select the rows the expression is computed on
+        :type conditions_list: Optional[List[Tuple[str, SQLConditionEnum, Any]]]
+        :param default: value to return if the table does not exist or if the selected value is NULL
+        :type default: Any
+        :return: the selected value
+        :rtype: Any
+        """
+        if conditions_list is None:
+            conditions_list = []
+        conditions = tuple((column_name, condition) for column_name, condition, _ in conditions_list)
+        execution_cmd = self.get_select_cmd(table, expression, conditions, ())
+        try:
+            row = self.db_cursor.execute(execution_cmd, [value for _, _, value in conditions_list]).fetchone()
+        except sqlite3.OperationalError:
+            return default
+        if row is None or row[0] is None:
+            return default
+        return row[0]
 
     def get_all_rows(self, table: Table) -> List[Tuple]:
         """
@@ -154,16 +197,14 @@ class DataBase:
         :return: None
         :rtype: None
         """
-        row_s = ", ".join(f"'{v}'" for v in row)
-        row_s = f'({row_s})'
-        execution_order = f"INSERT INTO {table.name} VALUES {row_s}"
+        execution_order = self.get_insert_cmd(table)
         try:
-            self.db_cursor.execute(execution_order)
+            self.db_cursor.execute(execution_order, row)
             if auto_commit:
                 self.commit()
         except sqlite3.OperationalError:
             self.create_table(table)
-            self.db_cursor.execute(execution_order)
+            self.db_cursor.execute(execution_order, row)
             if auto_commit:
                 self.commit()
         except sqlite3.IntegrityError as err:
@@ -175,9 +216,10 @@ class DataBase:
                 self.logger.error(msg)
                 raise err
 
-    def add_rows(self, table: Table, rows: List[Tuple], auto_commit: bool = True, update_if_exists: bool = False):
+    def add_rows(self, table: Table, rows: List[Tuple], auto_commit: bool = True, update_if_exists: bool = False,
+                 ignore_if_exists: bool = False):
         """
-        Add several rows to a table
+        Add several rows to a table with a single prepared statement
 
         :param table: table to add a row to
         :type table: Table
@@ -185,14 +227,29 @@ class DataBase:
         :type rows: List[Tuple]
         :param auto_commit: if the database state should be saved after the changes
         :type auto_commit:  bool
-        :param update_if_exists: if an integrity error is raised and this parameter is true,
-            will update the existing row
+        :param update_if_exists: if a row already exists with the same primary key and this parameter is true,
+            it will be replaced
         :type update_if_exists: bool
+        :param ignore_if_exists: if a row already exists with the same primary key and this parameter is true,
+            the new row will be skipped by sqlite instead of raising an error
+        :type ignore_if_exists: bool
         :return: None
         :rtype: None
         """
-        for row in rows:
-            self.add_row(table, row, auto_commit=False, update_if_exists=update_if_exists)
+        if update_if_exists and ignore_if_exists:
+            raise ValueError("update_if_exists and ignore_if_exists can not be both true")
+        if not len(rows):
+            return
+        execution_order = self.get_insert_cmd(table, replace=update_if_exists, ignore=ignore_if_exists)
+        try:
+            self.db_cursor.executemany(execution_order, rows)
+        except sqlite3.OperationalError:
+            self.create_table(table)
+            self.db_cursor.executemany(execution_order, rows)
+        except sqlite3.IntegrityError as err:
+            self.logger.error(f"tried to insert {len(rows)} rows in the table {table.name} but at least one of them"
+                              f" is occupied")
+            raise err
         if auto_commit:
             self.commit()
 
@@ -209,15 +266,16 @@ class DataBase:
         :return: None
         :rtype: None
         """
-        row_s = ", ".join(f"{n} = {v}" for n, v in zip(table.columns_names, row))
-        execution_order = f"UPDATE {table.name} SET {row_s} WHERE {table.primary_key} = {row[0]}"
-        self.db_cursor.execute(execution_order)
+        columns_names = [table.primary_key] + table.columns_names
+        row_s = ", ".join(f"{n} = ?" for n in columns_names[1:])
+        execution_order = f"UPDATE {table.name} SET {row_s} WHERE {table.primary_key} = ?"
+        self.db_cursor.execute(execution_order, tuple(row[1:]) + (row[0],))
         if auto_commit:
             self.commit()
 
     def create_table(self, table: Table):
         """
-        Create a table in the database
+        Create a table in the database, with its indexes
 
         :param table: Table instance with the config of the table to create
         :type table: Table
@@ -226,7 +284,20 @@ class DataBase:
         """
         create_cmd = self.get_create_cmd(table)
         self.db_cursor.execute(create_cmd)
-        self.db_conn.commit()
+        self.create_indexes(table)
+
+    def create_indexes(self, table: Table):
+        """
+        Create the missing indexes of an existing table in the database
+
+        :param table: Table instance with the config of the indexes to create
+        :type table: Table
+        :return: None
+        :rtype: None
+        """
+        for index_cmd in self.get_create_index_cmds(table):
+            self.db_cursor.execute(index_cmd)
+        self.commit()
 
     def drop_table(self, table: Union[Table, str]):
         """
@@ -267,42 +338,88 @@ class DataBase:
 
     def commit(self):
         """
-        Submit and save the database state
+        Submit and save the database state. Inside a transaction context nothing is done, the changes are
+        committed when the outermost context is exited
 
         :return: None
         :rtype: None
         """
-        self.db_conn.commit()
+        if not self._transaction_depth:
+            self.db_conn.commit()
+
+    def checkpoint(self):
+        """
+        Commit the changes made so far in the outermost transaction context, or outside of any context, so that they
+        are kept even if the transaction is rolled back later. Inside a nested transaction context nothing is done,
+        as the outer context may still roll back its changes.
+
+        :return: None
+        :rtype: None
+        """
+        if self._transaction_depth <= 1:
+            self.db_conn.commit()
+
+    @contextmanager
+    def transaction(self):
+        """
+        Group all the changes made inside the context in a single transaction: they are committed once when the
+        context is exited, or rolled back if an exception is raised. The commits requested inside the context, for
+        example by auto_commit, are deferred to its exit, use checkpoint to commit the changes made so far.
+        A transaction opened inside another one joins it: only the outermost context commits or rolls back.
+
+        .. code-block:: python
+
+            with db.transaction():
+                for row in rows:
+                    db.add_row(table, row, auto_commit=False)
+
+        :return: the database instance
+        :rtype: DataBase
+        """
+        self._transaction_depth += 1
+        try:
+            yield self
+        except Exception:
+            if self._transaction_depth == 1:
+                self.db_conn.rollback()
+            raise
+        else:
+            if self._transaction_depth == 1:
+                self.db_conn.commit()
+        finally:
+            self._transaction_depth -= 1
 
     @staticmethod
-    def _add_conditions(execution_cmd: str, conditions_list: List[Tuple[str, SQLConditionEnum, Any]]):
+    def _add_conditions(execution_cmd: str, conditions: Tuple[Tuple[str, SQLConditionEnum], ...]):
         """
-        Add a list of condition to an SQL command
+        Add a list of parametrized conditions to an SQL command, with one '?' placeholder per condition
 
         :param execution_cmd: SQL command without 'WHERE' statement
         :type execution_cmd: str
-        :param conditions_list: List of condition to add to the SQL command
-        :type conditions_list: List[Tuple[str, SQLConditionEnum, Any]]
+        :param conditions: columns and comparison operators of the conditions to add to the SQL command
+        :type conditions: Tuple[Tuple[str, SQLConditionEnum], ...]
         :return: the augmented command
         :rtype: str
         """
-        if len(conditions_list):
+        if len(conditions):
             add_cmd = ' WHERE'
-            for column_name, condition, value in conditions_list:
-                add_cmd = add_cmd + f" {column_name} {condition.value} '{value}' AND"
+            for column_name, condition in conditions:
+                add_cmd = add_cmd + f" {column_name} {condition.value} ? AND"
             return execution_cmd + add_cmd[:-4]
         else:
             return execution_cmd
 
     @staticmethod
-    def _add_order(execution_cmd: str, order_list: List[str]):
+    def _add_order(execution_cmd: str, order_list: Sequence[str], descending: bool = False):
         """
         Add an order specification to an SQL command
 
         :param execution_cmd: SQL command without 'ORDER BY' statement
         :type execution_cmd: str
         :param order_list: SQL order
-        :type order_list: List[str]
+        :type order_list: Sequence[str]
+        :param descending: if the order should be descending instead of ascending
+        :type descending: bool
         :return: the augmented command
         :rtype: str
         """
@@ -310,10 +427,40 @@ class DataBase:
             add_cmd = ' ORDER BY'
             for column_name in order_list:
                 add_cmd = add_cmd + f" {column_name},"
-            return execution_cmd + add_cmd[:-1] + ' ASC'
+            return execution_cmd + add_cmd[:-1] + (' DESC' if descending else ' ASC')
         else:
             return execution_cmd
 
+    @staticmethod
+    @lru_cache(maxsize=256)
+    def get_select_cmd(table: Table, selection: str, conditions: Tuple[Tuple[str, SQLConditionEnum], ...],
+                       order: Tuple[str, ...], descending: bool = False, limited: bool = False) -> str:
+        """
+        Return the parametrized command in string format to select rows from a table. The command only depends on
+        the shape of the query, so it is built once per shape.
+
+        :param table: Table instance to select the rows from
+        :type table: Table
+        :param selection: SQL selection (ex: '*' or 'MAX(time)')
+        :type selection: str
+        :param conditions: columns and comparison operators of the conditions, the values are bound on execution
+        :type conditions: Tuple[Tuple[str, SQLConditionEnum], ...]
+        :param order: columns to order the rows by
+        :type order: Tuple[str, ...]
+        :param descending: if the order should be descending instead of ascending
+        :type descending: bool
+        :param limited: if the number of rows is limited, the limit is then bound after the conditions values
+        :type limited: bool
+        :return: execution command for the selection, with one '?' placeholder per condition and for the limit
+        :rtype: str
+        """
+        execution_cmd = f"SELECT {selection} from {table.name}"
+        execution_cmd = DataBase._add_conditions(execution_cmd, conditions)
+        execution_cmd = DataBase._add_order(execution_cmd, order, descending)
+        if limited:
+            execution_cmd += " LIMIT ?"
+        return execution_cmd
+
     @staticmethod
     def get_create_cmd(table: Table) -> str:
         """
@@ -330,3 +477,46 @@ class DataBase:
         for arg_name, arg_type in zip(table.columns_names, table.columns_sql_types):
             cmd = cmd + f"[{arg_name}] {arg_type}, "
         return f"CREATE TABLE {table.name}\n({cmd[:-2]})"
+
+    @staticmethod
+    def get_create_index_cmds(table: Table) -> List[str]:
+        """
+        Return the commands in string format to create the indexes of a table in the database, the existing
+        indexes are left untouched
+
+        :param table: Table instance with the config of the indexes to create
+        :type table: Table
+        :return: execution commands for the indexes creation
+        :rtype: List[str]
+        """
+        cmds = []
+        for index_columns in table.indexes:
+            index_name = f"{table.name}_{'_'.join(index_columns)}_index"
+            cmds.append(f"CREATE INDEX IF NOT EXISTS {index_name} ON {table.name} ({', '.join(index_columns)})")
+        return cmds
+
+    @staticmethod
+    @lru_cache(maxsize=64)
+    def get_insert_cmd(table: Table, replace: bool = False, ignore: bool = False) -> str:
+        """
+        Return the parametrized command in string format to insert a row in a table. The command only depends on
+        the table definition, so it is built once per table.
+
+        :param table: Table instance where the rows will be inserted
+        :type table: Table
+        :param replace: if an existing row with the same primary key should be replaced by the inserted row
+        :type replace: bool
+        :param ignore: if the inserted row should be skipped when a row with the same primary key exists
+        :type ignore: bool
+        :return: execution command for the insertion, with one '?' placeholder per column
+        :rtype: str
+        """
+        n_columns = len(table.columns_names) + (table.primary_key is not None)
+        placeholders = ", ".join("?" * n_columns)
+        if replace:
+            insert_cmd = "INSERT OR REPLACE"
+        elif ignore:
+            insert_cmd = "INSERT OR IGNORE"
+        else:
+            insert_cmd = "INSERT"
+        return f"{insert_cmd} INTO {table.name} VALUES ({placeholders})"
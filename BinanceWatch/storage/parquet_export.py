@@ -0,0 +1,64 @@
+from pathlib import Path
+from typing import Optional
+
+try:
+    import pyarrow
+    import pyarrow.dataset
+except ImportError:
+    pyarrow = None
+
+from BinanceWatch.storage import tables
+from BinanceWatch.storage.BinanceDataBase import BinanceDataBase
+from BinanceWatch.utils.paths import get_data_path
+
+_TRADE_TABLES = {
+    'spot': tables.SPOT_TRADE_TABLE,
+    'cross_margin': tables.CROSS_MARGIN_TRADE_TABLE,
+    'isolated_margin': tables.ISOLATED_MARGIN_TRADE_TABLE
+}
+
+_SQL_TO_ARROW_TYPES = {
+    'INTEGER': 'int64',
+    'REAL': 'float64',
+    'TEXT': 'string'
+}
+
+
+def export_trades(db: BinanceDataBase, trade_type: str, folder: Optional[Path] = None) -> Path:
+    """
+    Export the trades of a database to a parquet dataset, partitioned by asset and ref_asset. The columnar files
+    are much faster to scan than the database for analytics, the database stays the storage used by the updates.
+    The partitions already in the folder are replaced, so the export can be run after each update.
+    Requires the optional dependency pyarrow.
+
+    https://arrow.apache.org/docs/python/dataset.html
+
+    :param db: database to read the trades from
+    :type db: BinanceDataBase
+    :param trade_type: type of the trades, must be one of ('spot', 'cross_margin', 'isolated_margin')
+    :type trade_type: str
+    :param folder: folder of the dataset, default to a folder named after the database and the trade type in the
+        data folder
+    :type folder: Optional[Path]
+    :return: folder of the dataset
+    :rtype: Path
+    """
+    if pyarrow is None:
+        raise ImportError("pyarrow is required to export the trades to parquet, install it with 'pip install pyarrow'")
+    try:
+        table = _TRADE_TABLES[trade_type]
+    except KeyError:
+        raise ValueError(f"trade type should be one of {tuple(_TRADE_TABLES)} but {trade_type} was received") from None
+    if folder is None:
+        folder = get_data_path() / "parquet" / f"{db.name}_{trade_type}_trades"
+
+    schema = pyarrow.schema([(name, _SQL_TO_ARROW_TYPES[sql_type])
+                             for name, sql_type in zip(table.columns_names, table.columns_sql_types)])
+    rows = db.get_trades(trade_type)
+    columns = list(zip(*rows)) if rows else [[] for _ in table.columns_names]
+    arrow_table = pyarrow.Table.from_arrays([pyarrow.array(column, type=field.type)
+                                             for column, field in zip(columns, schema)], schema=schema)
+    pyarrow.dataset.write_dataset(arrow_table, folder, format='parquet',
+                                  partitioning=[table.asset, table.refAsset], partitioning_flavor='hive',
+                                  existing_data_behavior='delete_matching')
+    return folder
@@ -9,7 +9,8 @@ class Table:
     """
 
     def __init__(self, name: str, columns_names: List[str], columns_sql_types: List[str],
-                 primary_key: Optional[str] = None, primary_key_sql_type: Optional[str] = None):
+                 primary_key: Optional[str] = None, primary_key_sql_type: Optional[str] = None,
+                 indexes: Optional[List[List[str]]] = None):
         """
         Initialise a Table instance
 
@@ -23,12 +24,15 @@ class Table:
         :type primary_key: Optional[str]
         :param primary_key_sql_type: sql type of the primary key (None, if no primary key is needed)
         :type primary_key_sql_type: Optional[str]
+        :param indexes: columns of each index of the table, the filtered columns first and the sorted column last
+        :type indexes: Optional[List[List[str]]]
         """
         self.name = name
         self.columns_names = columns_names
         self.columns_sql_types = columns_sql_types
         self.primary_key = primary_key
         self.primary_key_sql_type = primary_key_sql_type
+        self.indexes = indexes if indexes is not None else []
 
         for column_name in self.columns_names:
             try:
@@ -40,6 +44,11 @@ class Table:
         if self.primary_key is not None:
             setattr(self, self.primary_key, self.primary_key)
 
+        for index_columns in self.indexes:
+            unknown_columns = set(index_columns) - set(self.columns_names) - {self.primary_key}
+            if unknown_columns:
+                raise ValueError(f"the index columns {unknown_columns} are not columns of the table {self.name}")
+
 
 SPOT_TRADE_TABLE = Table(
     'spot_trade',
@@ -65,6 +74,9 @@ SPOT_TRADE_TABLE = Table(
         'REAL',
         'TEXT',
         'INTEGER'
+    ],
+    indexes=[
+        ['asset', 'refAsset', 'tradeId']
     ]
 )
 
@@ -81,7 +93,10 @@ SPOT_DEPOSIT_TABLE = Table(
         'REAL'
     ],
     primary_key='txId',
-    primary_key_sql_type='TEXT'
+    primary_key_sql_type='TEXT',
+    indexes=[
+        ['insertTime']
+    ]
 )
 
 
@@ -102,7 +117,10 @@ SPOT_WITHDRAW_TABLE = Table(
         'REAL'
     ],
     primary_key='withdrawId',
-    primary_key_sql_type='TEXT'
+    primary_key_sql_type='TEXT',
+    indexes=[
+        ['applyTime']
+    ]
 )
 
 SPOT_DIVIDEND_TABLE = Table(
@@ -118,7 +136,10 @@ SPOT_DIVIDEND_TABLE = Table(
         'REAL'
     ],
     primary_key='divId',
-    primary_key_sql_type='INTEGER'
+    primary_key_sql_type='INTEGER',
+    indexes=[
+        ['divTime']
+    ]
 )
 
 SPOT_DUST_TABLE = Table(
@@ -154,6 +175,9 @@ LENDING_INTEREST_TABLE = Table(
         'TEXT',
         'TEXT',
         'REAL',
+    ],
+    indexes=[
+        ['lendingType', 'interestTime']
     ]
 )
 
@@ -172,7 +196,10 @@ LENDING_PURCHASE_TABLE = Table(
         'INTEGER'
     ],
     primary_key='purchaseId',
-    primary_key_sql_type='INTEGER'
+    primary_key_sql_type='INTEGER',
+    indexes=[
+        ['lendingType', 'purchaseTime']
+    ]
 )
 
 LENDING_REDEMPTION_TABLE = Table(
@@ -188,6 +215,9 @@ LENDING_REDEMPTION_TABLE = Table(
         'TEXT',
         'TEXT',
         'INTEGER'
+    ],
+    indexes=[
+        ['lendingType', 'redemptionTime']
     ]
 )
 
@@ -215,6 +245,9 @@ CROSS_MARGIN_TRADE_TABLE = Table(
         'REAL',
         'TEXT',
         'INTEGER'
+    ],
+    indexes=[
+        ['asset', 'refAsset', 'tradeId']
     ]
 )
 
@@ -231,8 +264,10 @@ CROSS_MARGIN_LOAN_TABLE = Table(
         'REAL'
     ],
     primary_key='txId',
-    primary_key_sql_type='INTEGER'
-
+    primary_key_sql_type='INTEGER',
+    indexes=[
+        ['asset', 'loanTime']
+    ]
 )
 
 CROSS_MARGIN_REPAY_TABLE = Table(
@@ -250,8 +285,10 @@ CROSS_MARGIN_REPAY_TABLE = Table(
         'REAL'
     ],
     primary_key='txId',
-    primary_key_sql_type='INTEGER'
-
+    primary_key_sql_type='INTEGER',
+    indexes=[
+        ['asset', 'repayTime']
+    ]
 )
 
 CROSS_MARGIN_INTEREST_TABLE = Table(
@@ -267,6 +304,9 @@ CROSS_MARGIN_INTEREST_TABLE = Table(
         'TEXT',
         'REAL',
         'TEXT'
+    ],
+    indexes=[
+        ['asset', 'interestTime']
     ]
 )
 
@@ -296,6 +336,9 @@ ISOLATED_MARGIN_TRADE_TABLE = Table(
         'REAL',
         'TEXT',
         'INTEGER'
+    ],
+    indexes=[
+        ['asset', 'refAsset', 'tradeId']
     ]
 )
 
@@ -314,8 +357,10 @@ ISOLATED_MARGIN_LOAN_TABLE = Table(
         'REAL'
     ],
     primary_key='txId',
-    primary_key_sql_type='INTEGER'
-
+    primary_key_sql_type='INTEGER',
+    indexes=[
+        ['symbol', 'asset', 'loanTime']
+    ]
 )
 
 ISOLATED_MARGIN_REPAY_TABLE = Table(
@@ -335,8 +380,10 @@ ISOLATED_MARGIN_REPAY_TABLE = Table(
         'REAL'
     ],
     primary_key='txId',
-    primary_key_sql_type='INTEGER'
-
+    primary_key_sql_type='INTEGER',
+    indexes=[
+        ['symbol', 'asset', 'repayTime']
+    ]
 )
 
 ISOLATED_MARGIN_INTEREST_TABLE = Table(
@@ -354,6 +401,9 @@ ISOLATED_MARGIN_INTEREST_TABLE = Table(
         'TEXT',
         'REAL',
         'TEXT'
+    ],
+    indexes=[
+        ['symbol', 'interestTime']
     ]
 )
 
@@ -374,7 +424,10 @@ ISOLATED_MARGIN_TRANSFER_TABLE = Table(
         'REAL'
     ],
     primary_key='tranId',
-    primary_key_sql_type='INTEGER'
+    primary_key_sql_type='INTEGER',
+    indexes=[
+        ['symbol', 'trfTime']
+    ]
 )
 
 UNIVERSAL_TRANSFER_TABLE = Table(
@@ -392,5 +445,20 @@ UNIVERSAL_TRANSFER_TABLE = Table(
         'REAL'
     ],
     primary_key='tranId',
-    primary_key_sql_type='INTEGER'
+    primary_key_sql_type='INTEGER',
+    indexes=[
+        ['trfType', 'trfTime']
+    ]
+)
+
+SYNC_STATE_TABLE = Table(
+    "sync_state_table",
+    [
+        'syncTime'
+    ],
+    [
+        'INTEGER'
+    ],
+    primary_key='syncKey',
+    primary_key_sql_type='TEXT'
 )
@@ -0,0 +1,72 @@
+import threading
+import time
+
+
+class RateLimiter:
+    """
+    Thread-safe token bucket limiting the weight of the API calls sent over a period of time. Each call consumes
+    tokens equal to its weight and the bucket refills continuously, up to its capacity, over the period.
+    The bucket can be aligned on the weight actually counted by the server, so that calls wait before the limit is
+    breached instead of being rejected.
+    """
+
+    def __init__(self, capacity: float, period: float = 60):
+        """
+        Initialise a rate limiter with a full bucket
+
+        :param capacity: maximum weight that can be consumed over one period
+        :type capacity: float
+        :param period: length of the period in seconds
+        :type period: float
+        """
+        if capacity <= 0 or period <= 0:
+            raise ValueError(f"capacity and period should be positive but {capacity} and {period} were received")
+        self.capacity = capacity
+        self.period = period
+        self.tokens = capacity
+        self.last_refill = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self):
+        """
+        Add the tokens regenerated since the last refill, the lock must be held by the caller
+
+        :return: None
+        :rtype: None
+        """
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.last_refill) * self.capacity / self.period)
+        self.last_refill = now
+
+    def acquire(self, weight: float = 1):
+        """
+        Wait until enough tokens are available in the bucket and consume them
+
+        :param weight: weight of the call about to be sent, capped to the capacity of the bucket
+        :type weight: float
+        :return: None
+        :rtype: None
+        """
+        weight = min(weight, self.capacity)
+        while True:
+            with self._lock:
+                self._refill()
+                if self.tokens >= weight:
+                    self.tokens -= weight
+                    return
+                wait_time = (weight - self.tokens) * self.period / self.capacity
+            time.sleep(wait_time)
+
+    def sync(self, used_weight: float):
+        """
+        Align the bucket on the weight already used in the current period, as reported by the server. The bucket is
+        only ever emptied by this method, so that concurrent calls estimated locally are not forgotten.
+
+        :param used_weight: weight used in the current period
+        :type used_weight: float
+        :return: None
+        :rtype: None
+        """
+        with self._lock:
+            self._refill()
+            self.tokens = max(0., min(self.tokens, self.capacity - used_weight))
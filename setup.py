@@ -24,7 +24,8 @@ setup(
     description='Local tracker of a binance account',
     long_description=long_description,
     long_description_content_type='text/x-rst',
-    install_requires=['numpy', 'tqdm', 'dateparser', 'requests', 'python-binance>=0.7.9', 'appdirs'],
+    install_requires=['numpy', 'tqdm', 'requests', 'python-binance>=0.7.9', 'appdirs'],
+    extras_require={'fast': ['orjson'], 'parquet': ['pyarrow']},
     keywords='binance exchange wallet save tracking history bitcoin ethereum btc eth',
     classifiers=[
         'Intended Audience :: Developers',
@@ -3,3 +3,6 @@ modules needs to be imported here to be detected in the __main__ file for auto i
 If a module is not imported here, it won't be tested by the tests package
 """
 import tests.test_DataBase
+import tests.test_RateLimiter
+import tests.test_BinanceManager
+# tests.test_parquet_export is only run by pytest: it is skipped with pytest.importorskip when pyarrow is missing
@@ -0,0 +1,305 @@
+import importlib
+import threading
+import time
+
+import requests
+
+from BinanceWatch.BinanceManager import BinanceManager
+
+binance_manager_module = importlib.import_module('BinanceWatch.BinanceManager')
+
+
+class FakeClient:
+    """
+    Stand-in for binance.Client, which pings the API when created. The tests replace the API calls of the manager,
+    so only the session of the client is used.
+    """
+
+    def __init__(self, api_key=None, api_secret=None, requests_params=None):
+        self.session = requests.Session()
+
+
+def _get_manager(max_workers: int = 1, min_sync_interval: float = 0) -> BinanceManager:
+    """
+    Return a manager on an empty database, with a fake client
+
+    :param max_workers: number of threads of the manager, 1 makes the concurrent results come in order
+    :type max_workers: int
+    :param min_sync_interval: minimum number of seconds between two updates of the same data
+    :type min_sync_interval: float
+    :return: manager
+    :rtype: BinanceManager
+    """
+    client_class = binance_manager_module.Client
+    binance_manager_module.Client = FakeClient
+    try:
+        manager = BinanceManager('', '', account_name='test_manager', max_workers=max_workers,
+                                 min_sync_interval=min_sync_interval)
+    finally:
+        binance_manager_module.Client = client_class
+    manager.db.drop_all_tables()
+    return manager
+
+
+def _get_trades(first_id: int, n_trades: int):
+    """
+    Return trades as returned by the API
+
+    :param first_id: id of the first trade
+    :type first_id: int
+    :param n_trades: number of trades
+    :type n_trades: int
+    :return: trades
+    :rtype: List[Dict]
+    """
+    return [{'id': first_id + i, 'time': 1600000000000 + i, 'qty': '0.5', 'price': '100.25', 'commission': '0.001',
+             'commissionAsset': 'BNB', 'isBuyer': True} for i in range(n_trades)]
+
+
+def test_trades_checkpoints(verbose=0, **kwargs):
+    manager = _get_manager()
+    symbols_info = [{'base': 'BTC', 'quote': 'USDT'}, {'base': 'ETH', 'quote': 'USDT'},
+                    {'base': 'BNB', 'quote': 'USDT'}, {'base': 'XRP', 'quote': 'USDT'}]
+    manager._cross_margin_pairs_cache = (time.time(), symbols_info, {'BTC', 'ETH', 'BNB', 'XRP', 'USDT'})
+    trades = {'BTCUSDT': _get_trades(1, 3), 'ETHUSDT': _get_trades(10, 3), 'BNBUSDT': _get_trades(20, 1)}
+
+    def call_binance_client(method_name, params=None):
+        if params['symbol'] not in trades:
+            raise RuntimeError("interrupting the update")
+        return [trade for trade in trades[params['symbol']] if trade['id'] >= params['fromId']]
+
+    manager._call_binance_client = call_binance_client
+    commit_rows_interval = BinanceManager.COMMIT_ROWS_INTERVAL
+    BinanceManager.COMMIT_ROWS_INTERVAL = 4
+    try:
+        manager.update_all_cross_margin_trades()
+        raise RuntimeError("the above line should throw an error as the last symbol fails")
+    except RuntimeError as err:
+        if "interrupting" not in str(err):
+            raise
+    finally:
+        BinanceManager.COMMIT_ROWS_INTERVAL = commit_rows_interval
+
+    saved_ids = [row[0] for row in manager.db.get_trades('cross_margin')]
+    if verbose:
+        print(f"trades saved after the failure: {saved_ids}")
+    # BTCUSDT and ETHUSDT reached the interval and were committed, BNBUSDT was rolled back with the failure
+    assert sorted(saved_ids) == [1, 2, 3, 10, 11, 12]
+    manager.db.close()
+
+
+def test_isolated_trades_checkpoints(verbose=0, **kwargs):
+    manager = _get_manager()
+    symbols_info = [{'asset': 'BTC', 'ref_asset': 'USDT'}, {'asset': 'ETH', 'ref_asset': 'USDT'},
+                    {'asset': 'BNB', 'ref_asset': 'USDT'}, {'asset': 'XRP', 'ref_asset': 'USDT'}]
+    trades = {'BTCUSDT': _get_trades(1, 3), 'ETHUSDT': _get_trades(10, 3), 'BNBUSDT': _get_trades(20, 1)}
+
+    def call_binance_client(method_name, params=None):
+        if params['symbol'] not in trades:
+            raise RuntimeError("interrupting the update")
+        return [trade for trade in trades[params['symbol']] if trade['id'] >= params['fromId']]
+
+    manager._call_binance_client = call_binance_client
+    commit_rows_interval = BinanceManager.COMMIT_ROWS_INTERVAL
+    BinanceManager.COMMIT_ROWS_INTERVAL = 4
+    try:
+        manager.update_isolated_margin_trades(symbols_info)
+        raise RuntimeError("the above line should throw an error as the last symbol fails")
+    except RuntimeError as err:
+        if "interrupting" not in str(err):
+            raise
+    finally:
+        BinanceManager.COMMIT_ROWS_INTERVAL = commit_rows_interval
+
+    saved_ids = [row[0] for row in manager.db.get_trades('isolated_margin')]
+    if verbose:
+        print(f"isolated trades saved after the failure: {saved_ids}")
+    assert sorted(saved_ids) == [1, 2, 3, 10, 11, 12]
+    manager.db.close()
+
+
+def test_isolated_transfer_types(verbose=0, **kwargs):
+    manager = _get_manager()
+    transfers = [
+        {'txId': 1, 'transFrom': 'SPOT', 'transTo': 'ISOLATED_MARGIN', 'timestamp': 1600000000000, 'asset': 'USDT',
+         'amount': '10.5'},
+        {'txId': 2, 'transFrom': 'ISOLATED_MARGIN', 'transTo': 'SPOT', 'timestamp': 1600000001000, 'asset': 'USDT',
+         'amount': '5'}
+    ]
+    with manager.db.transaction():
+        manager._save_isolated_transfers(transfers, isolated_symbol='BTCUSDT')
+    saved_transfers = manager.db.get_isolated_transfers()
+    if verbose:
+        print(f"saved transfers: {saved_transfers}")
+    assert [(1, 'IN'), (2, 'OUT')] == sorted((row[0], row[1]) for row in saved_transfers)
+
+    unknown_transfer = {'txId': 3, 'transFrom': 'SPOT', 'transTo': 'FUTURES', 'timestamp': 1600000002000,
+                        'asset': 'USDT', 'amount': '1'}
+    try:
+        with manager.db.transaction():
+            manager._save_isolated_transfers([unknown_transfer], isolated_symbol='BTCUSDT')
+        raise RuntimeError("the above line should throw an error as the transfer direction is unknown")
+    except ValueError:
+        pass
+    assert 2 == len(manager.db.get_isolated_transfers())
+    manager.db.close()
+
+
+def test_spot_dusts_deduplication(verbose=0, **kwargs):
+    manager = _get_manager()
+
+    def get_sub_dust(tran_id, asset):
+        return {'tranId': tran_id, 'operateTime': '2021-02-01 10:00:00', 'fromAsset': asset, 'amount': '0.1',
+                'transferedAmount': '0.001', 'serviceChargeAmount': '0.00002'}
+
+    dust_log = {'results': {'total': 3, 'rows': [
+        {'logs': [get_sub_dust(1, 'ETH'), get_sub_dust(1, 'XRP')]},  # a transaction converting two assets
+        {'logs': [get_sub_dust(2, 'ADA')]},
+        {'logs': [get_sub_dust(2, 'ADA')]}  # the same transaction listed twice in the response
+    ]}}
+    manager._call_binance_client = lambda method_name, params=None: dust_log
+
+    manager.update_spot_dusts()
+    saved_dusts = sorted((row[0], row[2]) for row in manager.db.get_spot_dusts())
+    if verbose:
+        print(f"saved dusts: {saved_dusts}")
+    assert [(1, 'ETH'), (1, 'XRP'), (2, 'ADA')] == saved_dusts
+
+    manager.update_spot_dusts()  # nothing new in the dust log
+    assert 3 == len(manager.db.get_spot_dusts())
+    manager.db.close()
+
+
+def test_sync_time(verbose=0, **kwargs):
+    manager = _get_manager()
+    assert manager.db.get_sync_time('spot_deposits') is None
+    manager.db.set_sync_time('spot_deposits', 1600000000000)
+    assert 1600000000000 == manager.db.get_sync_time('spot_deposits')
+    manager.db.set_sync_time('spot_deposits', 1600000005000)  # a later update replaces the previous time
+    assert 1600000005000 == manager.db.get_sync_time('spot_deposits')
+    assert manager.db.get_sync_time('spot_withdraws') is None
+    manager.db.close()
+
+
+def test_recently_synced(verbose=0, **kwargs):
+    manager = _get_manager(min_sync_interval=3600)
+    now = int(1000 * time.time())
+    assert not manager._is_recently_synced('spot_deposits')  # never synced
+    manager.db.set_sync_time('spot_deposits', now - 3600 * 1000 + 60000)
+    assert manager._is_recently_synced('spot_deposits')
+    manager.db.set_sync_time('spot_deposits', now - 3600 * 1000 - 60000)
+    assert not manager._is_recently_synced('spot_deposits')
+
+    manager.min_sync_interval = 0  # the updates are never skipped
+    manager.db.set_sync_time('spot_deposits', now)
+    assert not manager._is_recently_synced('spot_deposits')
+    manager.db.close()
+
+
+def test_archive_synced(verbose=0, **kwargs):
+    three_months = BinanceManager._THREE_MONTHS_MS
+    now = 1600000000000
+    assert not BinanceManager._is_archived_window(now - three_months, now)
+    assert BinanceManager._is_archived_window(now - three_months - 1, now)
+
+    manager = _get_manager()
+    now = int(1000 * time.time())
+    assert not manager._is_archive_synced('cross_margin_repays_BTC')  # never synced
+    manager.db.set_sync_time('cross_margin_repays_BTC', now - three_months + 60000)
+    assert manager._is_archive_synced('cross_margin_repays_BTC')
+    manager.db.set_sync_time('cross_margin_repays_BTC', now - three_months - 60000)
+    assert not manager._is_archive_synced('cross_margin_repays_BTC')
+    manager.db.close()
+
+
+def test_unused_isolated_symbols(verbose=0, **kwargs):
+    manager = _get_manager()
+    manager.db.add_isolated_transfer(1, 'IN', 1600000000000, 'BTCUSDT', 'USDT', 10)
+    manager.db.add_isolated_transfer(2, 'IN', 1600000000000, 'ETHUSDT', 'ETH', 1)
+    assert [('BTCUSDT', 'BTC', 'USDT'), ('ETHUSDT', 'ETH', 'USDT')] == sorted(manager._get_isolated_symbols())
+
+    ttl = BinanceManager.UNUSED_ISOLATED_SYMBOL_TTL
+    now = int(1000 * time.time())
+    manager.db.set_sync_time(manager._get_unused_symbol_key('BTCUSDT'), now - 1000 * ttl + 60000)
+    manager.db.set_sync_time(manager._get_unused_symbol_key('ETHUSDT'), now - 1000 * ttl - 60000)
+    isolated_symbols = manager._get_isolated_symbols()
+    if verbose:
+        print(f"isolated symbols to update: {isolated_symbols}")
+    # BTCUSDT was reported as unused recently, ETHUSDT has to be checked again
+    assert [('ETHUSDT', 'ETH', 'USDT')] == isolated_symbols
+
+    # the symbols given explicitly are never skipped
+    symbols_info = [{'asset': 'BTC', 'ref_asset': 'USDT'}]
+    assert [('BTCUSDT', 'BTC', 'USDT')] == manager._get_isolated_symbols(symbols_info)
+    manager.db.close()
+
+
+def test_fetch_pages(verbose=0, **kwargs):
+    manager = _get_manager(max_workers=8)
+    rows = list(range(9))  # four full pages of two rows then a last page of one row
+    requested_pages = []
+    lock = threading.Lock()
+
+    def call_binance_client(method_name, params=None):
+        with lock:
+            requested_pages.append(params['current'])
+        start = 2 * (params['current'] - 1)
+        return {'rows': rows[start: start + params['size']]}
+
+    manager._call_binance_client = call_binance_client
+    pages = list(manager._fetch_pages('get_dust_log', {'size': 2}, rows_key='rows'))
+    if verbose:
+        print(f"pages: {pages}, requested pages: {requested_pages}")
+    assert [[0, 1], [2, 3], [4, 5], [6, 7], [8]] == pages
+    # pages are requested by windows of 1, 2 then 4 pages: nothing is requested after the window of the last page
+    assert set(range(1, 6)) <= set(requested_pages) <= set(range(1, 8))
+    assert len(requested_pages) == len(set(requested_pages))
+
+    # the last page is full, the next empty page ends the fetch
+    rows = list(range(6))
+    requested_pages.clear()
+    pages = list(manager._fetch_pages('get_dust_log', {'size': 2}, rows_key='rows'))
+    assert [[0, 1], [2, 3], [4, 5], []] == pages
+    assert set(range(1, 5)) <= set(requested_pages) <= set(range(1, 8))
+
+    # a single short page
+    rows = [0]
+    requested_pages.clear()
+    assert [[0]] == list(manager._fetch_pages('get_dust_log', {'size': 2}, rows_key='rows'))
+    assert [1] == requested_pages
+    manager.db.close()
+
+
+def test_paginate(verbose=0, **kwargs):
+    manager = _get_manager()
+    archived_rows = [{'timestamp': 2000}, {'timestamp': 3000}, {'timestamp': 4000}]
+    current_rows = [{'timestamp': 6000}]
+    calls = []
+
+    def call_binance_client(method_name, params=None):
+        calls.append((params['archived'], params['current'], params['startTime']))
+        rows = archived_rows if params['archived'] else current_rows
+        start = params['size'] * (params['current'] - 1)
+        return {'rows': rows[start: start + params['size']]}
+
+    manager._call_binance_client = call_binance_client
+    params = {'size': 2, 'startTime': 1000, 'archived': True}
+    rows = list(manager._paginate('get_margin_repay_details', params, time_key='timestamp'))
+    if verbose:
+        print(f"rows: {rows}, calls: {calls}")
+    assert archived_rows + current_rows == rows
+    # a full then a short archived page, then the current pages from one second after the latest archived row
+    assert [(True, 1, 1000), (True, 2, 1000), (False, 1, 5000)] == calls
+    assert {'size': 2, 'startTime': 1000, 'archived': True} == params  # the parameters of the caller are kept
+
+    def request_margin_api(method_name, params=None):
+        calls.append((params['method'], params['data']['current']))
+        return {'rows': current_rows}
+
+    calls.clear()
+    manager._call_binance_client = request_margin_api
+    params = {'size': 2, 'startTime': 1000}
+    rows = list(manager._paginate('_request_margin_api', params, request_params={'method': 'get'}))
+    assert current_rows == rows
+    assert [('get', 1)] == calls
+    manager.db.close()
@@ -1,3 +1,5 @@
+import sqlite3
+
 from BinanceWatch.storage.DataBase import DataBase, SQLConditionEnum
 from BinanceWatch.storage.tables import Table
 
@@ -107,3 +109,229 @@ def test_inserts_search_2(verbose=0, **kwargs):
 
     # check min ge is right
     assert max([r[0] for r in rows]) == db.get_conditions_rows(table2, selection=f"MAX({table2.age})")[0][0]
+
+
+def test_transaction(verbose=0, **kwargs):
+    db.drop_table(table1)
+    db.create_table(table1)
+    rows = [
+        (1, 15, 'Karl', 55.5),
+        (2, 18, 'Kitty', 61.1)
+    ]
+    with db.transaction():
+        for row in rows:
+            db.add_row(table1, row, auto_commit=False)
+    assert rows == db.get_all_rows(table1)
+
+    try:
+        with db.transaction():
+            db.add_row(table1, (3, 18, 'Marc', 48.1), auto_commit=False)
+            raise RuntimeError("interrupting the transaction")
+    except RuntimeError:
+        pass
+    retrieved_rows = db.get_all_rows(table1)
+    if verbose:
+        print(f"rows after the rolled back transaction: {retrieved_rows}")
+    assert rows == retrieved_rows
+
+
+def test_nested_transaction(verbose=0, **kwargs):
+    db.drop_table(table1)
+    db.create_table(table1)
+    try:
+        with db.transaction():
+            db.add_row(table1, (1, 15, 'Karl', 55.5), auto_commit=False)
+            with db.transaction():
+                db.add_row(table1, (2, 18, 'Kitty', 61.1), auto_commit=False)
+            raise RuntimeError("interrupting the outer transaction")
+    except RuntimeError:
+        pass
+    retrieved_rows = db.get_all_rows(table1)
+    if verbose:
+        print(f"rows after the rolled back outer transaction: {retrieved_rows}")
+    assert [] == retrieved_rows
+
+
+def test_transaction_auto_commit(verbose=0, **kwargs):
+    db.drop_table(table1)
+    try:
+        with db.transaction():
+            db.add_rows(table1, [(1, 15, 'Karl', 55.5)])  # the table is created and the row committed by default
+            db.add_row(table1, (2, 18, 'Kitty', 61.1), auto_commit=True)
+            raise RuntimeError("interrupting the transaction")
+    except RuntimeError:
+        pass
+    retrieved_rows = db.get_all_rows(table1)
+    if verbose:
+        print(f"rows after the rolled back transaction: {retrieved_rows}")
+    assert [] == retrieved_rows
+
+
+def test_transaction_checkpoint(verbose=0, **kwargs):
+    db.drop_table(table1)
+    db.create_table(table1)
+    rows = [
+        (1, 15, 'Karl', 55.5),
+        (2, 18, 'Kitty', 61.1)
+    ]
+    try:
+        with db.transaction():
+            db.add_rows(table1, rows, auto_commit=False)
+            db.checkpoint()
+            with db.transaction():
+                db.add_row(table1, (3, 18, 'Marc', 48.1), auto_commit=False)
+                db.checkpoint()  # nested: the outer transaction keeps the control of the commit
+            raise RuntimeError("interrupting the transaction")
+    except RuntimeError:
+        pass
+    retrieved_rows = db.get_all_rows(table1)
+    if verbose:
+        print(f"rows after the rolled back transaction: {retrieved_rows}")
+    assert rows == retrieved_rows
+
+
+def test_add_rows_update(verbose=0, **kwargs):
+    db.drop_table(table1)
+    rows = [
+        (1, 15, "Karl O'Neil", 55.5),
+        (2, 18, 'Kitty', 61.1)
+    ]
+    db.add_rows(table1, rows)
+    assert rows == db.get_all_rows(table1)
+
+    try:
+        db.add_rows(table1, [(2, 19, 'Kitty', 60.2)])
+        raise RuntimeError("the above line should throw an error as the primary key is already used")
+    except sqlite3.IntegrityError:
+        db.db_conn.rollback()
+
+    updated_rows = [
+        (2, 19, 'Kitty', 60.2),
+        (3, 18, 'Marc', 48.1)
+    ]
+    db.add_rows(table1, updated_rows, update_if_exists=True)
+    retrieved_rows = db.get_conditions_rows(table1, order_list=[table1.key])
+    if verbose:
+        print(f"rows after the update: {retrieved_rows}")
+    assert rows[:1] + updated_rows == retrieved_rows
+
+    db.add_row(table1, (3, 20, 'Marcus', 49.3), update_if_exists=True)
+    assert (3, 20, 'Marcus', 49.3) == db.get_row_by_key(table1, 3)
+
+
+def test_add_rows_ignore(verbose=0, **kwargs):
+    db.drop_table(table1)
+    rows = [
+        (1, 15, "Karl O'Neil", 55.5),
+        (2, 18, 'Kitty', 61.1)
+    ]
+    db.add_rows(table1, rows)
+
+    new_rows = [
+        (2, 19, 'Kitty', 60.2),
+        (3, 18, 'Marc', 48.1)
+    ]
+    db.add_rows(table1, new_rows, ignore_if_exists=True)
+    retrieved_rows = db.get_conditions_rows(table1, order_list=[table1.key])
+    if verbose:
+        print(f"rows after the insertion: {retrieved_rows}")
+    assert rows + new_rows[1:] == retrieved_rows
+
+
+def test_create_indexes(verbose=0, **kwargs):
+    table3 = Table(
+        'test_table3',
+        [
+            'age',
+            'surname',
+            'weight'
+        ],
+        [
+            'INTEGER',
+            'TEXT',
+            'REAL'
+        ],
+        indexes=[
+            ['surname', 'age']
+        ]
+    )
+    index_cmds = db.get_create_index_cmds(table3)
+    if verbose:
+        print(index_cmds)
+    assert index_cmds == ["CREATE INDEX IF NOT EXISTS test_table3_surname_age_index ON test_table3 (surname, age)"]
+
+    db.drop_table(table3)
+    db.add_rows(table3, [(15, 'Karl', 55.5), (18, 'Karl', 61.1)])
+    db.create_indexes(table3)
+    plan = db._fetch_rows("EXPLAIN QUERY PLAN SELECT MAX(age) FROM test_table3 WHERE surname='Karl'")
+    if verbose:
+        print(plan)
+    assert 'test_table3_surname_age_index' in plan[0][-1]
+    db.drop_table(table3)
+
+    try:
+        Table('test_table4', ['age'], ['INTEGER'], indexes=[['surname', 'age']])
+        raise RuntimeError("the above line should throw an error as the index column does not exist")
+    except ValueError:
+        pass
+
+
+def test_fetch_scalar(verbose=0, **kwargs):
+    db.drop_table(table1)
+    assert -1 == db.fetch_scalar(table1, f"MAX({table1.age})", default=-1)
+
+    rows = [
+        (1, 15, "Karl O'Neil", 55.5),
+        (2, 18, 'Kitty', 61.1),
+        (3, 25, 'Kitty', 48.1)
+    ]
+    db.add_rows(table1, rows)
+    max_age = db.fetch_scalar(table1, f"MAX({table1.age})",
+                              conditions_list=[(table1.surname, SQLConditionEnum.equal, 'Kitty')])
+    if verbose:
+        print(f"max age of the Kitty rows: {max_age}")
+    assert 25 == max_age
+    assert 15 == db.fetch_scalar(table1, f"MAX({table1.age})",
+                                 conditions_list=[(table1.surname, SQLConditionEnum.equal, "Karl O'Neil")])
+    assert -1 == db.fetch_scalar(table1, f"MAX({table1.age})", default=-1,
+                                 conditions_list=[(table1.surname, SQLConditionEnum.equal, 'Marc')])
+
+
+def test_select_cmd(verbose=0, **kwargs):
+    conditions = ((table1.age, SQLConditionEnum.equal), (table1.weight, SQLConditionEnum.greater_equal))
+    select_cmd = db.get_select_cmd(table1, '*', conditions, (table1.weight,))
+    if verbose:
+        print(select_cmd)
+    assert select_cmd == "SELECT * from test_table1 WHERE age = ? AND weight >= ? ORDER BY weight ASC"
+
+    db.drop_table(table1)
+    rows = [
+        (1, 15, "Karl O'Neil", 55.5),
+        (2, 18, 'Kitty', 61.1)
+    ]
+    db.add_rows(table1, rows)
+    conditions_list = [(table1.surname, SQLConditionEnum.equal, "Karl O'Neil")]
+    assert rows[:1] == db.get_conditions_rows(table1, conditions_list=conditions_list)
+
+
+def test_limit_descending(verbose=0, **kwargs):
+    db.drop_table(table2)
+    rows = [
+        (15, 'Karl', 55.5),
+        (18, 'Kitty', 61.1),
+        (25, 'Kitty', 48.1),
+        (21, 'Kitty', 58.2)
+    ]
+    db.add_rows(table2, rows)
+    conditions = [(table2.surname, SQLConditionEnum.equal, 'Kitty')]
+    retrieved_rows = db.get_conditions_rows(table2, conditions_list=conditions, order_list=[table2.age],
+                                            descending=True, limit=2)
+    if verbose:
+        print(f"two oldest Kitty rows: {retrieved_rows}")
+    assert [rows[2], rows[3]] == retrieved_rows
+
+    try:
+        db.get_conditions_rows(table2, limit=-1)
+        raise RuntimeError("the above line should throw an error as the limit is negative")
+    except ValueError:
+        pass
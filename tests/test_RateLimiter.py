@@ -0,0 +1,35 @@
+import time
+
+from BinanceWatch.utils.RateLimiter import RateLimiter
+
+
+def test_acquire(verbose=0, **kwargs):
+    rate_limiter = RateLimiter(capacity=10, period=1)
+    start = time.monotonic()
+    for _ in range(10):
+        rate_limiter.acquire()
+    assert time.monotonic() - start < 0.1  # the bucket starts full
+
+    rate_limiter.acquire(weight=3)  # 3 tokens need 0.3 second to be regenerated
+    duration = time.monotonic() - start
+    if verbose:
+        print(f"waited {duration:.3f} seconds for the tokens")
+    assert 0.25 < duration < 0.6
+
+
+def test_sync(verbose=0, **kwargs):
+    rate_limiter = RateLimiter(capacity=10, period=1)
+    rate_limiter.sync(used_weight=8)
+    assert rate_limiter.tokens <= 2
+
+    rate_limiter.sync(used_weight=1)  # the server report can not refill the bucket
+    assert rate_limiter.tokens <= 2.1
+
+    rate_limiter.sync(used_weight=15)
+    assert rate_limiter.tokens == 0
+
+    try:
+        RateLimiter(capacity=0)
+        raise RuntimeError("the above line should throw an error as the capacity is not positive")
+    except ValueError:
+        pass
@@ -0,0 +1,48 @@
+import tempfile
+from pathlib import Path
+
+import pytest
+
+from BinanceWatch.storage import tables
+from BinanceWatch.storage.BinanceDataBase import BinanceDataBase
+from BinanceWatch.storage.parquet_export import export_trades
+
+
+def _read_rows(folder: Path):
+    """
+    Read back the rows of a parquet dataset exported from the spot trades table
+
+    :param folder: folder of the dataset
+    :type folder: Path
+    :return: rows sorted by trade id, with the columns in the order of the table
+    :rtype: List[Tuple]
+    """
+    import pyarrow.dataset
+    dataset = pyarrow.dataset.dataset(folder, format='parquet', partitioning='hive')
+    rows = dataset.to_table(columns=tables.SPOT_TRADE_TABLE.columns_names).to_pylist()
+    return sorted(tuple(row.values()) for row in rows)
+
+
+def test_export_trades(verbose=0, **kwargs):
+    pytest.importorskip('pyarrow')
+    db = BinanceDataBase('test_parquet_export')
+    db.drop_all_tables()
+    trades = [(1, 1600000000000, 'BTC', 'USDT', 0.5, 10000.5, 0.001, 'BNB', 1),
+              (2, 1600000001000, 'BTC', 'USDT', 0.25, 10100., 0.0005, 'BNB', 0),
+              (3, 1600000002000, 'ETH', 'BTC', 2., 0.03, 0.002, 'ETH', 1)]
+    db.add_trades('spot', trades)
+
+    with tempfile.TemporaryDirectory() as temp_folder:
+        folder = Path(temp_folder) / 'spot_trades'
+        export_trades(db, 'spot', folder)
+        partitions = sorted(path.relative_to(folder).as_posix() for path in folder.glob('*/*'))
+        if verbose:
+            print(f"partitions: {partitions}")
+        assert ['asset=BTC/refAsset=USDT', 'asset=ETH/refAsset=BTC'] == partitions
+        assert trades == _read_rows(folder)
+
+        # a new export replaces the partitions instead of appending to them
+        db.add_trades('spot', [(4, 1600000003000, 'BTC', 'USDT', 0.1, 10200., 0.0001, 'BNB', 0)])
+        export_trades(db, 'spot', folder)
+        assert [trade[0] for trade in _read_rows(folder)] == [1, 2, 3, 4]
+    db.close()